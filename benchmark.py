@@ -0,0 +1,780 @@
+"""Benchmarks for the device hot paths, run on the host emulator.
+
+    python benchmark.py -o results.json
+    python benchmark.py -o new.json --compare results.json --threshold 0.2
+
+Each benchmark gets a fresh emulated board. Per operation it reports ops/sec
+(host wall time), Python calls (function and builtin calls seen by
+sys.setprofile, a proxy for interpreter cost on the Pico), I2C and SPI
+transactions and bytes, and emulated device time. With --compare, a
+benchmark regresses when its ops/sec falls, or its calls, transactions or
+bytes grow, by more than the threshold; the exit status is then 1. The
+counts are deterministic, ops/sec depends on host load.
+
+Rendering times include the pure-Python framebuf shim, so they are only
+comparable between runs on the same host.
+
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+import emulator
+
+BENCHMARKS = []
+ROUNDS = 5
+
+# Metrics where a larger value is a regression; ops_per_sec is the opposite
+COST_METRICS = ('calls', 'i2c_transactions', 'i2c_bytes', 'spi_transactions', 'spi_bytes')
+
+
+def benchmark(name):
+    """Register a benchmark: a function taking the board and returning the operation to time."""
+    def register(setup):
+        BENCHMARKS.append((name, setup))
+        return setup
+    return register
+
+
+def new_sensor(board, **kwargs):
+    import bme680
+    from machine import I2C
+
+    sensor = bme680.BME680(i2c_addr=0x77, i2c_device=I2C(1), **kwargs)
+    sensor.set_humidity_oversample(bme680.OS_2X)
+    sensor.set_pressure_oversample(bme680.OS_4X)
+    sensor.set_temperature_oversample(bme680.OS_8X)
+    sensor.set_filter(bme680.FILTER_SIZE_3)
+    sensor.set_gas_status(bme680.ENABLE_GAS_MEAS)
+    sensor.set_gas_heater_temperature(320)
+    sensor.set_gas_heater_duration(30)
+    sensor.select_gas_heater_profile(0)
+    return sensor
+
+
+@benchmark('bme680.get_sensor_data')
+def bench_get_sensor_data(board):
+    sensor = new_sensor(board)
+
+    def op():
+        # Includes polling until the conversion it triggered has finished
+        meas_index = sensor.data.meas_index
+        if not sensor.get_sensor_data() or sensor.data.meas_index == meas_index:
+            raise RuntimeError('no new sensor data')
+    return op
+
+
+def decode(board, float_compensation):
+    sensor = new_sensor(board, float_compensation=float_compensation)
+    if not sensor.get_sensor_data():
+        raise RuntimeError('no sensor data')
+    check_no_bus_allocations(sensor)
+    check_compensation(sensor.calibration_data)
+
+    def op():
+        # The fields stay valid until the next trigger, so this repeats the
+        # burst read, decode and compensation of one sample
+        sensor._read_field_data()
+    return op
+
+
+class _AllocationProbe:
+    """I2C stand-in that snapshots the heap while a read's buffer is still live."""
+
+    def __init__(self, i2c):  # noqa D107
+        self.i2c = i2c
+        self.snapshots = []
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        raise AssertionError('read {} bytes into a new buffer'.format(nbytes))
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        import tracemalloc
+
+        self.i2c.readfrom_mem_into(addr, memaddr, buf)
+        self.snapshots.append(tracemalloc.take_snapshot())
+
+
+def check_no_bus_allocations(sensor, reads=100):
+    """Check that _read_field_data allocates no buffer for its bus transfer.
+
+    Compares the heap on entry with the heap while the transfer returns,
+    counting only blocks allocated by the driver, so the emulator's own
+    copies and the compensation results that follow are not counted.
+
+    """
+    import tracemalloc
+
+    import bme680
+
+    driver = tracemalloc.Filter(True, os.path.join(os.path.dirname(bme680.__file__), '*'))
+    i2c = sensor._i2c
+    sensor._i2c = probe = _AllocationProbe(i2c)
+    tracemalloc.start()
+    try:
+        for _ in range(reads):
+            before = tracemalloc.take_snapshot().filter_traces((driver,))
+            sensor._read_field_data()
+            during = probe.snapshots.pop().filter_traces((driver,))
+            for stat in during.compare_to(before, 'lineno'):
+                if stat.count_diff > 0:
+                    raise AssertionError('bus read allocated {} block(s) at {}'.format(
+                        stat.count_diff, stat.traceback))
+    finally:
+        tracemalloc.stop()
+        sensor._i2c = i2c
+
+
+def check_compensation(calibration_data, samples=20000):
+    """Check the compensation classes against the driver's original integer formulas.
+
+    Sweeps pseudo-random ADC values across the sensor's operating range:
+    IntegerCompensation must match bit for bit, FloatCompensation within
+    0.01 C, 0.2 hPa and 0.1 %RH.
+
+    """
+    from bme680.compensation import FloatCompensation, IntegerCompensation
+
+    exact = IntegerCompensation(calibration_data)
+    approx = FloatCompensation(calibration_data)
+    seed = 1
+    for n in range(samples):
+        seed = (seed * 1103515245 + 12345) & 0x7fffffff
+        adc_temp = 290000 + seed % 400000
+        adc_pres = (seed >> 3) % (1 << 20)
+        adc_hum = (seed >> 7) % (1 << 16)
+        adc_gas = seed % 1024
+        gas_range = (seed >> 11) % 16
+        offset = (n % 3 - 1) * 512
+
+        temp, t_fine = compensation_reference_temperature(calibration_data, adc_temp, offset)
+        pres = compensation_reference_pressure(calibration_data, t_fine, adc_pres)
+        hum = compensation_reference_humidity(calibration_data, t_fine, adc_hum)
+        gas = compensation_reference_gas_low(calibration_data, adc_gas, gas_range)
+        got = (exact.temperature(adc_temp, offset), exact.pressure(adc_pres),
+               exact.humidity(adc_hum), exact.gas_resistance_low(adc_gas, gas_range))
+        if got != (temp, pres, hum, gas) or exact.t_fine != t_fine:
+            raise AssertionError('integer compensation differs at ADC T={} P={} H={} G={}/{}: {} != {}'.format(
+                adc_temp, adc_pres, adc_hum, adc_gas, gas_range, got, (temp, pres, hum, gas)))
+
+        if abs(approx.temperature(adc_temp, offset) - temp) > 1:
+            raise AssertionError('float temperature off at ADC {}'.format(adc_temp))
+        if 30000 <= pres <= 110000 and abs(approx.pressure(adc_pres) - pres) > 20:
+            raise AssertionError('float pressure off at ADC {}, T={}'.format(adc_pres, adc_temp))
+        if abs(approx.humidity(adc_hum) - hum) > 100:
+            raise AssertionError('float humidity off at ADC {}, T={}'.format(adc_hum, adc_temp))
+
+
+def compensation_reference_temperature(c, temperature_adc, offset_t_fine):
+    # The driver's integer formulas as they were before bme680.compensation,
+    # kept as the reference for check_compensation
+    var1 = (temperature_adc >> 3) - (c.par_t1 << 1)
+    var2 = (var1 * c.par_t2) >> 11
+    var3 = ((var1 >> 1) * (var1 >> 1)) >> 12
+    var3 = ((var3) * (c.par_t3 << 4)) >> 14
+    t_fine = (var2 + var3) + offset_t_fine
+    return (((t_fine * 5) + 128) >> 8), t_fine
+
+
+def compensation_reference_pressure(c, t_fine, pressure_adc):
+    var1 = ((t_fine) >> 1) - 64000
+    var2 = ((((var1 >> 2) * (var1 >> 2)) >> 11) *
+            c.par_p6) >> 2
+    var2 = var2 + ((var1 * c.par_p5) << 1)
+    var2 = (var2 >> 2) + (c.par_p4 << 16)
+    var1 = (((((var1 >> 2) * (var1 >> 2)) >> 13) *
+            ((c.par_p3 << 5)) >> 3) +
+            ((c.par_p2 * var1) >> 1))
+    var1 = var1 >> 18
+
+    var1 = ((32768 + var1) * c.par_p1) >> 15
+    calc_pressure = 1048576 - pressure_adc
+    calc_pressure = ((calc_pressure - (var2 >> 12)) * (3125))
+
+    if calc_pressure >= (1 << 31):
+        calc_pressure = ((calc_pressure // var1) << 1)
+    else:
+        calc_pressure = ((calc_pressure << 1) // var1)
+
+    var1 = (c.par_p9 * (((calc_pressure >> 3) *
+            (calc_pressure >> 3)) >> 13)) >> 12
+    var2 = ((calc_pressure >> 2) *
+            c.par_p8) >> 13
+    var3 = ((calc_pressure >> 8) * (calc_pressure >> 8) *
+            (calc_pressure >> 8) *
+            c.par_p10) >> 17
+
+    return (calc_pressure) + ((var1 + var2 + var3 + (c.par_p7 << 7)) >> 4)
+
+
+def compensation_reference_humidity(c, t_fine, humidity_adc):
+    temp_scaled = ((t_fine * 5) + 128) >> 8
+    var1 = (humidity_adc - ((c.par_h1 * 16))) -\
+           (((temp_scaled * c.par_h3) // (100)) >> 1)
+    var2 = (c.par_h2 *
+            (((temp_scaled * c.par_h4) // (100)) +
+             (((temp_scaled * ((temp_scaled * c.par_h5) // (100))) >> 6) //
+             (100)) + (1 * 16384))) >> 10
+    var3 = var1 * var2
+    var4 = c.par_h6 << 7
+    var4 = ((var4) + ((temp_scaled * c.par_h7) // (100))) >> 4
+    var5 = ((var3 >> 14) * (var3 >> 14)) >> 10
+    var6 = (var4 * var5) >> 1
+    calc_hum = (((var3 + var6) >> 10) * (1000)) >> 12
+
+    return min(max(calc_hum, 0), 100000)
+
+
+def compensation_reference_gas_low(c, gas_res_adc, gas_range):
+    from bme680.constants import lookupTable1, lookupTable2
+
+    var1 = ((1340 + (5 * c.range_sw_err)) * (lookupTable1[gas_range])) >> 16
+    var2 = (((gas_res_adc << 15) - (16777216)) + var1)
+    var3 = ((lookupTable2[gas_range] * var1) >> 9)
+    calc_gas_res = ((var3 + (var2 >> 1)) / var2)
+
+    if calc_gas_res < 0:
+        calc_gas_res = (1 << 32) + calc_gas_res
+
+    return calc_gas_res
+
+
+@benchmark('bme680.decode_integer')
+def bench_decode_integer(board):
+    return decode(board, False)
+
+
+@benchmark('bme680.decode_float')
+def bench_decode_float(board):
+    return decode(board, True)
+
+
+def startup(board, warm):
+    import bme680
+    from machine import I2C
+
+    path = os.path.join(tempfile.mkdtemp(), 'bme680.json')
+    bme680.BME680(i2c_addr=0x77, i2c_device=I2C(1), calibration_cache=path)
+    if not warm:
+        os.remove(path)
+
+    def op():
+        bme680.BME680(i2c_addr=0x77, i2c_device=I2C(1), calibration_cache=path)
+        if not warm:
+            os.remove(path)
+    return op
+
+
+@benchmark('bme680.startup_cold')
+def bench_startup_cold(board):
+    return startup(board, False)
+
+
+@benchmark('bme680.startup_warm')
+def bench_startup_warm(board):
+    return startup(board, True)
+
+
+@benchmark('iaq.getIAQ')
+def bench_get_iaq(board, fast_math=False):
+    from bme680IAQ import IAQTracker
+    from bme680.constants import FieldData
+
+    tracker = IAQTracker(burn_in_cycles=0, fast_math=fast_math)
+    samples = []
+    for i in range(64):
+        data = FieldData()
+        data.temperature = 21.0 + (i % 8) * 0.25
+        data.humidity = 40.0 + (i % 5)
+        data.gas_resistance = 90000.0 + (i * 7919) % 40000
+        samples.append(data)
+    # Fill the ceiling history so every call runs at steady state
+    for data in samples * 4:
+        tracker.getIAQ(data)
+    state = [0]
+
+    def op():
+        i = state[0]
+        tracker.getIAQ(samples[i])
+        state[0] = (i + 1) & 63
+    return op
+
+
+@benchmark('iaq.getIAQ_fast')
+def bench_get_iaq_fast(board):
+    from bme680IAQ import IAQTracker
+
+    check_fast_math(IAQTracker(fast_math=True))
+    return bench_get_iaq(board, fast_math=True)
+
+
+def check_fast_math(tracker, tolerance=1e-4):
+    """Check the fast humidity compensation against the exact formula over -40 to 85 C, 0 to 100 %RH."""
+    import math
+
+    worst = 0.0
+    for i in range(12501):
+        temp = -40.0 + i * 0.01
+        rho_exact = tracker.waterSatDensity(temp)
+        rho_fast = tracker.waterSatDensityFast(temp)
+        for hum in (0.0, 25.0, 50.0, 75.0, 100.0):
+            exact = math.exp(tracker.slope * (hum * 10 * rho_exact))
+            fast = tracker.expFast(tracker.slope * (hum * 10 * rho_fast))
+            worst = max(worst, abs(fast / exact - 1))
+    if worst > tolerance:
+        raise AssertionError('fast humidity compensation off by {:.3g} relative'.format(worst))
+    return worst
+
+
+@benchmark('instrument.getIAQ')
+def bench_get_iaq_instrumented(board):
+    # iaq.getIAQ inside a span, for the cost of instrumentation when on
+    import instrument
+
+    check_instrument_off()
+    return instrument.wrap('bench.getIAQ', bench_get_iaq(board))
+
+
+def check_instrument_off():
+    """Check that disabling instrumentation puts back the exact original methods."""
+    import instrument
+    from bme680 import BME680
+    from bme680IAQ import IAQTracker
+    from epaper_display import EPD_2in9
+
+    before = (BME680.get_sensor_data, IAQTracker.getIAQ, EPD_2in9.ReadBusy)
+    instrument.enable()
+    if IAQTracker.getIAQ is before[1]:
+        raise AssertionError('instrument.enable() did not wrap IAQTracker.getIAQ')
+    instrument.disable()
+    if (BME680.get_sensor_data, IAQTracker.getIAQ, EPD_2in9.ReadBusy) != before:
+        raise AssertionError('instrument.disable() left wrapped methods behind')
+
+
+@benchmark('iaq.getIAQ_batch_1000')
+def bench_get_iaq_batch(board):
+    from bme680IAQ import IAQTracker
+
+    temperature = [21.0 + (i % 8) * 0.25 for i in range(1000)]
+    humidity = [40.0 + (i % 5) for i in range(1000)]
+    gas_resistance = [90000.0 + (i * 7919) % 40000 for i in range(1000)]
+    check_batch(IAQTracker)
+    tracker = IAQTracker(burn_in_cycles=0)
+    tracker.getIAQ_batch(temperature, humidity, gas_resistance)
+
+    def op():
+        tracker.getIAQ_batch(temperature, humidity, gas_resistance)
+    return op
+
+
+def check_batch(tracker_class, samples=50000, tolerance=32):
+    """Check getIAQ_batch against getIAQ sample by sample, burn-in included.
+
+    With numpy, compensatedGas rounds its two exp() terms differently from
+    math.exp; the first one's error is scaled by the second's argument, up to
+    about 11 at 85 C and 100 %RH. So compensated gas may be off by tolerance
+    machine epsilons, relative, and AQ by a little more after the ceiling's
+    running mean.
+
+    """
+    import math
+
+    from bme680.constants import FieldData
+
+    seed = 1
+    temperature, humidity, gas_resistance = [], [], []
+    for _ in range(samples):
+        seed = (seed * 1103515245 + 12345) & 0x7fffffff
+        temperature.append(-40.0 + (seed % 125000) / 1000.0)
+        humidity.append((seed >> 5) % 100001 / 1000.0)
+        gas_resistance.append(5000.0 + (seed >> 9) % 495000)
+
+    batch = tracker_class(burn_in_cycles=300, gas_recal_period=1000)
+    single = tracker_class(burn_in_cycles=300, gas_recal_period=1000)
+    eps = sys.float_info.epsilon
+    comp = batch.compensatedGas(temperature, humidity, gas_resistance)
+    for i in range(samples):
+        exact = gas_resistance[i] * math.exp(
+            single.slope * (humidity[i] * 10 * single.waterSatDensity(temperature[i])))
+        if abs(comp[i] - exact) > tolerance * eps * exact:
+            raise AssertionError('compensatedGas off by {:.3g} eps at sample {}'.format(
+                abs(comp[i] - exact) / exact / eps, i))
+
+    got = batch.getIAQ_batch(temperature, humidity, gas_resistance)
+    data = FieldData()
+    for i in range(samples):
+        data.temperature = temperature[i]
+        data.humidity = humidity[i]
+        data.gas_resistance = gas_resistance[i]
+        expected = single.getIAQ(data)
+        if (got[i] is None) != (expected is None) or \
+                expected is not None and abs(got[i] - expected) > 4 * tolerance * eps * expected:
+            raise AssertionError('getIAQ_batch differs from getIAQ at sample {}: {!r} != {!r}'.format(
+                i, got[i], expected))
+
+
+@benchmark('timeseries.add')
+def bench_timeseries_add(board):
+    from timeseries import TimeSeries
+
+    # Full rings, one sample per second so the minute roll-up closes every 60th call
+    history = TimeSeries()
+    t = [0]
+
+    def op():
+        t[0] += 1
+        history.add(t[0], 21.5, 1003.2, 45.1, 120000.0, 87.5)
+    for _ in range(3600 * 25):
+        op()
+    return op
+
+
+@benchmark('timeseries.window_1h')
+def bench_timeseries_window(board):
+    from timeseries import TimeSeries
+
+    history = TimeSeries()
+    for t in range(3600 * 25):
+        history.add(t, 21.5, 1003.2, 45.1, 120000.0, 87.5)
+
+    def op():
+        history.window('aq', 3600)
+    return op
+
+
+def new_flash_log():
+    from datalog import FlashLog
+
+    return FlashLog(os.path.join(tempfile.mkdtemp(), 'log'))
+
+
+@benchmark('datalog.append')
+def bench_datalog_append(board):
+    # One reading into the page buffer; every 127th call also writes the page
+    log = new_flash_log()
+    check_record_crc(log)
+    t = [0]
+
+    def op():
+        t[0] += 1
+        log.append(t[0], 21.5, 1003.2, 45.1, 120000.0, 87.5)
+    return op
+
+
+def check_record_crc(log):
+    """Check that appended records pass their CRC and blank, zeroed or erased, ones fail."""
+    from datalog import RECORD_SIZE, recordValid
+
+    log.append(1, 21.5, 1003.2, 45.1, 120000.0, 87.5)
+    if not recordValid(log.buffer, log.fill - RECORD_SIZE):
+        raise AssertionError('appended record fails its CRC')
+    for fill in (0x00, 0xff):
+        if recordValid(bytearray([fill]) * RECORD_SIZE):
+            raise AssertionError('record of 0x{:02x} bytes passes its CRC'.format(fill))
+
+
+@benchmark('datalog.append_page')
+def bench_datalog_append_page(board):
+    # A page worth of readings, packing included, ending in one page write; segment
+    # rotation keeps the files bounded however many rounds run
+    from datalog import RECORD_SIZE
+
+    log = new_flash_log()
+    per_page = log.page_size // RECORD_SIZE
+    t = [0]
+
+    def op():
+        for _ in range(per_page):
+            t[0] += 1
+            log.append(t[0], 21.5, 1003.2, 45.1, 120000.0, 87.5)
+    return op
+
+
+@benchmark('datalog.query_5min')
+def bench_datalog_query(board):
+    # Last five minutes out of about four and a half hours of 1 Hz readings
+    log = new_flash_log()
+    for t in range(16000):
+        log.append(t, 21.5, 1003.2, 45.1, 120000.0, 87.5)
+    log.flush(force=True)
+
+    def op():
+        for _ in log.query(16000 - 300):
+            pass
+    return op
+
+
+def new_display(board):
+    from epaper_display import EpaperDisplay
+
+    display = EpaperDisplay()
+    display.update_display(21.5, 1003.2, 45.1, 'Good')
+    return display
+
+
+@benchmark('display.render')
+def bench_render(board):
+    display = new_display(board)
+
+    def op():
+        display.render(21.5, 1003.2, 45.1, 'Good')
+    return op
+
+
+@benchmark('display.update_display')
+def bench_update_display(board):
+    display = new_display(board)
+    display.full_refresh_every = 1 << 30
+    values = [(21.5, 1003.2, 45.1, 'Good'), (21.6, 1003.2, 45.1, 'Good')]
+    state = [0]
+
+    def op():
+        # Alternate the temperature so one region changes each time
+        state[0] ^= 1
+        display.update_display(*values[state[0]])
+    return op
+
+
+@benchmark('epd.init')
+def bench_epd_init(board):
+    epd = new_display(board).epd
+
+    def op():
+        epd.init()
+    return op
+
+
+@benchmark('epd.display_Base')
+def bench_display_base(board):
+    epd = new_display(board).epd
+
+    def op():
+        epd.display_Base(epd.buffer)
+    return op
+
+
+@benchmark('epd.display_Partial')
+def bench_display_partial(board):
+    epd = new_display(board).epd
+
+    def op():
+        epd.display_Partial(epd.buffer)
+    return op
+
+
+@benchmark('epd.display_4Gray')
+def bench_display_4gray(board):
+    epd = new_display(board).epd
+    epd.init_4Gray()
+    image = epd.buffer_4Gray
+    for i in range(len(image)):
+        image[i] = (i * 37 + (i >> 5)) & 0xff
+    epd.display_4Gray(image)
+    # init_4Gray opens the RAM window one byte column in
+    check_gray4_planes(image, board.epd.plane(0x24, 1), board.epd.plane(0x26, 1))
+
+    def op():
+        epd.display_4Gray(image)
+    return op
+
+
+def check_gray4_planes(image, plane_new, plane_old):
+    """Check the planes the panel received byte for byte against gray4_reference."""
+    ref_new, ref_old = gray4_reference(image)
+    for name, plane, ref in (('0x24', plane_new, ref_new), ('0x26', plane_old, ref_old)):
+        for i in range(len(ref)):
+            if plane[i] != ref[i]:
+                raise AssertionError('4-gray plane {} differs from the reference at byte {}'.format(name, i))
+
+
+def gray4_reference(image):
+    """Convert a GS2_HMSB image to the 0x24/0x26 planes the way display_4Gray did before lookup tables.
+
+    Kept verbatim, bar collecting bytes instead of sending them one by one,
+    as the reference the table-driven converter must match bit for bit.
+
+    """
+    planes = []
+    for gray1, gray2 in ((0x00, 0x01), (0x01, 0x00)):
+        plane = bytearray(4736)
+        for i in range(0, 4736):
+            temp3 = 0
+            for j in range(0, 2):
+                temp1 = image[i * 2 + j]
+                for k in range(0, 2):
+                    temp2 = temp1 & 0x03
+                    if temp2 == 0x03:
+                        temp3 |= 0x00   # white
+                    elif temp2 == 0x00:
+                        temp3 |= 0x01   # black
+                    elif temp2 == 0x02:
+                        temp3 |= gray1
+                    else:   # 0x01
+                        temp3 |= gray2
+                    temp3 <<= 1
+
+                    temp1 >>= 2
+                    temp2 = temp1 & 0x03
+                    if temp2 == 0x03:   # white
+                        temp3 |= 0x00
+                    elif temp2 == 0x00:   # black
+                        temp3 |= 0x01
+                    elif temp2 == 0x02:
+                        temp3 |= gray1
+                    else:   # 0x01
+                        temp3 |= gray2
+
+                    if j != 1 or k != 1:
+                        temp3 <<= 1
+                    temp1 >>= 2
+            plane[i] = temp3
+        planes.append(plane)
+    return planes
+
+
+def count_calls(op):
+    """Count the calls op makes, with each call into the emulator counted once.
+
+    Whatever the emulator does to serve a call is not counted, as it has
+    no cost on the device.
+
+    """
+    emulator_dir = os.path.dirname(emulator.__file__)
+    calls = [0]
+    depth = [0]
+
+    def profile(frame, event, arg):
+        in_emulator = frame.f_code.co_filename.startswith(emulator_dir)
+        if event == 'call':
+            if depth[0] == 0:
+                calls[0] += 1
+            if in_emulator:
+                depth[0] += 1
+        elif event == 'return':
+            if in_emulator:
+                depth[0] -= 1
+        elif event == 'c_call' and depth[0] == 0:
+            calls[0] += 1
+    sys.setprofile(profile)
+    try:
+        op()
+    finally:
+        sys.setprofile(None)
+    return calls[0]
+
+
+def run_one(setup, min_time):
+    board = emulator.install()
+    try:
+        op = setup(board)
+        op()
+
+        board.reset_stats()
+        start_us = board.clock.now_us()
+        op()
+        stats = board.stats()
+        i2c = stats['i2c'].get(1, {})
+        spi = stats['spi'].get(1, {})
+        result = {
+            'calls': count_calls(op),
+            'i2c_transactions': i2c.get('transactions', 0),
+            'i2c_bytes': i2c.get('bytes_read', 0) + i2c.get('bytes_written', 0),
+            'spi_transactions': spi.get('transactions', 0),
+            'spi_bytes': spi.get('bytes', 0),
+            'device_ms': (stats['time_us'] - start_us) / 1000.0,
+        }
+
+        # Best of several rounds, which is steadier than one long run
+        best = 0.0
+        for _ in range(ROUNDS):
+            n = 0
+            start = time.perf_counter()
+            elapsed = 0.0
+            while elapsed < min_time / ROUNDS or n < 3:
+                op()
+                n += 1
+                elapsed = time.perf_counter() - start
+            best = max(best, n / elapsed)
+        result['ops_per_sec'] = best
+        return result
+    finally:
+        emulator.uninstall()
+
+
+def run(names=None, min_time=0.5):
+    results = {}
+    for name, setup in BENCHMARKS:
+        if names and not any(name.startswith(prefix) for prefix in names):
+            continue
+        results[name] = run_one(setup, min_time)
+    return results
+
+
+def compare(results, previous, threshold):
+    """Get (name, metric, old, new) for every metric that regressed by more than threshold."""
+    regressions = []
+    for name, result in results.items():
+        old = previous.get(name)
+        if old is None:
+            continue
+        if old.get('ops_per_sec') and result['ops_per_sec'] < old['ops_per_sec'] * (1 - threshold):
+            regressions.append((name, 'ops_per_sec', old['ops_per_sec'], result['ops_per_sec']))
+        for metric in COST_METRICS:
+            if metric in old and result[metric] > old[metric] * (1 + threshold):
+                regressions.append((name, metric, old[metric], result[metric]))
+    return regressions
+
+
+def report(results, previous=None):
+    print('{:<26}{:>12}{:>10}{:>8}{:>9}{:>8}{:>9}{:>12}'.format(
+        'benchmark', 'ops/sec', 'calls', 'i2c tx', 'i2c B', 'spi tx', 'spi B', 'device ms'))
+    for name, r in results.items():
+        line = '{:<26}{:>12.1f}{:>10}{:>8}{:>9}{:>8}{:>9}{:>12.1f}'.format(
+            name, r['ops_per_sec'], r['calls'], r['i2c_transactions'], r['i2c_bytes'],
+            r['spi_transactions'], r['spi_bytes'], r['device_ms'])
+        if previous and name in previous and previous[name].get('ops_per_sec'):
+            line += '  {:+.1f}%'.format((r['ops_per_sec'] / previous[name]['ops_per_sec'] - 1) * 100)
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-o', '--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help='allowed relative regression, default 0.20')
+    parser.add_argument('--min-time', type=float, default=0.5, help='seconds to time each benchmark')
+    parser.add_argument('names', nargs='*', help='only run benchmarks starting with these names')
+    args = parser.parse_args(argv)
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)['results']
+
+    results = run(args.names, args.min_time)
+    report(results, previous)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'python': platform.python_implementation() + ' ' + platform.python_version(),
+                'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if previous is not None:
+        regressions = compare(results, previous, args.threshold)
+        for name, metric, old, new in regressions:
+            print('REGRESSION {} {}: {:.6g} -> {:.6g}'.format(name, metric, old, new))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
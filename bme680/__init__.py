@@ -1,9 +1,16 @@
 """BME680 Temperature, Pressure, Humidity & Gas Sensor."""
-from .constants import lookupTable1, lookupTable2
 from .constants import BME680Data
+from .compensation import IntegerCompensation, FloatCompensation
+from .group import SensorGroup
 from . import constants
+import binascii
+import json
 import math
 import time
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 
 __version__ = '1.1.1'
 
@@ -24,19 +31,53 @@ class BME680(BME680Data):
 
     :param i2c_addr: One of I2C_ADDR_PRIMARY (0x76) or I2C_ADDR_SECONDARY (0x77)
     :param i2c_device: Optional smbus or compatible instance for facilitating i2c communications.
+    :param float_compensation: Use Bosch's floating-point compensation formulas instead of the integer ones
+    :param calibration_cache: Optional file path used to persist calibration between boots
 
     """
 
-    def __init__(self, i2c_addr=constants.I2C_ADDR_PRIMARY, i2c_device=None):
+    def __init__(self, i2c_addr=constants.I2C_ADDR_PRIMARY, i2c_device=None, float_compensation=False,
+                 calibration_cache=None):
         """Initialise BME680 sensor instance and verify device presence.
 
         :param i2c_addr: i2c address of BME680
         :param i2c_device: Optional SMBus-compatible instance for i2c transport
+        :param float_compensation: Use the floating-point compensation formulas
+        :param calibration_cache: File path of the calibration cache.
+            When the cached chip ID and signature match the sensor, the variant,
+            calibration and heater values are restored from it instead of
+            being read and computed, and no soft reset or first reading is done.
 
         """
         BME680Data.__init__(self)
 
         self.i2c_addr = i2c_addr
+        self.float_compensation = float_compensation
+        self._compensation = None
+        self.calibration_cache = calibration_cache
+        # Hex of the second coefficient block, which identifies an individual sensor
+        self.signature = None
+        # Heater resistance register values already computed, by target temperature
+        self._heater_values = {}
+        # Heater duration in ms of each of the 10 profiles
+        self._heater_durations = [0] * (constants.NBCONV_MAX + 1)
+        # Heater sequence: number of profiles cycled, and the latest gas
+        # resistance measured at each step
+        self._sequence_len = 0
+        self.gas_fingerprint = None
+        self.fingerprint_cycles = 0
+        # Heater profile of the last forced-mode trigger not yet stepped past
+        self._triggered_profile = None
+        # Count of I2C transactions issued, for verifying traffic against a fake bus
+        self.i2c_transactions = 0
+        # Shadow copy of the heater and control registers (0x5A-0x75);
+        # setters update it and apply() writes the dirty registers in one burst
+        self._shadow = bytearray(constants.CONF_REGS_LEN)
+        self._dirty = 0
+        # Preallocated buffers so a sample's I2C traffic allocates nothing
+        self._field_buf = bytearray(constants.FIELD_LENGTH)
+        self._reg_buf = bytearray(1)
+        self._trigger_buf = bytearray(2)
         self._i2c = i2c_device
         if self._i2c is None:
             from machine import I2C
@@ -49,12 +90,17 @@ class BME680(BME680Data):
         except OSError:
             raise RuntimeError("Unable to identify BME680 at 0x{:02x} (IOError)".format(self.i2c_addr))
 
-        self._variant = self._get_regs(constants.CHIP_VARIANT_ADDR, 1)
+        cache = self._load_calibration_cache()
+        if cache is None:
+            self._variant = self._get_regs(constants.CHIP_VARIANT_ADDR, 1)
 
-        self.soft_reset()
-        self.set_power_mode(constants.SLEEP_MODE)
+            self.soft_reset()
+            self.set_power_mode(constants.SLEEP_MODE)
 
-        self._get_calibration_data()
+            self._get_calibration_data()
+        else:
+            self._load_shadow()
+            self.set_power_mode(constants.SLEEP_MODE)
 
         self.set_humidity_oversample(constants.OS_2X)
         self.set_pressure_oversample(constants.OS_4X)
@@ -65,24 +111,108 @@ class BME680(BME680Data):
         else:
             self.set_gas_status(constants.ENABLE_GAS_MEAS_LOW)
         self.set_temp_offset(0)
-        self.get_sensor_data()
+        if cache is None:
+            self.get_sensor_data()
+            self.save_calibration_cache()
 
     def _get_calibration_data(self):
         """Retrieve the sensor calibration data and store it in .calibration_data."""
         calibration = self._get_regs(constants.COEFF_ADDR1, constants.COEFF_ADDR1_LEN)
-        calibration += self._get_regs(constants.COEFF_ADDR2, constants.COEFF_ADDR2_LEN)
+        calibration2 = self._get_regs(constants.COEFF_ADDR2, constants.COEFF_ADDR2_LEN)
+        self.signature = binascii.hexlify(bytes(calibration2)).decode()
+        calibration += calibration2
 
         heat_range = self._get_regs(constants.ADDR_RES_HEAT_RANGE_ADDR, 1)
-        heat_value = constants.twos_comp(self._get_regs(constants.ADDR_RES_HEAT_VAL_ADDR, 1), bits=8)
-        sw_error = constants.twos_comp(self._get_regs(constants.ADDR_RANGE_SW_ERR_ADDR, 1), bits=8)
+        heat_value = self._get_regs(constants.ADDR_RES_HEAT_VAL_ADDR, 1)
+        sw_error = self._get_regs(constants.ADDR_RANGE_SW_ERR_ADDR, 1)
+
+        self._raw_calibration = (calibration, heat_range, heat_value, sw_error)
+        self._set_calibration_data(calibration, heat_range, heat_value, sw_error)
+
+    def _set_calibration_data(self, calibration, heat_range, heat_value, sw_error):
+        """Parse raw calibration registers into .calibration_data."""
+        heat_value = constants.twos_comp(heat_value, bits=8)
+        sw_error = constants.twos_comp(sw_error, bits=8)
 
         self.calibration_data.set_from_array(calibration)
         self.calibration_data.set_other(heat_range, heat_value, sw_error)
 
+        if self.float_compensation:
+            self._compensation = FloatCompensation(self.calibration_data)
+        else:
+            self._compensation = IntegerCompensation(self.calibration_data)
+
+    def _load_calibration_cache(self):
+        """Restore calibration from the cache file if it matches this sensor.
+
+        Costs one signature read. Returns the cache contents, or None if there
+        is no usable cache and the sensor needs a full initialisation.
+
+        """
+        if self.calibration_cache is None:
+            return None
+        try:
+            with open(self.calibration_cache) as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        if cache.get('chip_id') != self.chip_id:
+            return None
+        signature = self._get_regs(constants.COEFF_ADDR2, constants.COEFF_ADDR2_LEN)
+        if binascii.hexlify(bytes(signature)).decode() != cache.get('signature'):
+            return None
+
+        try:
+            calibration = list(binascii.unhexlify(cache['calibration']))
+            self._variant = cache['variant']
+            self._raw_calibration = (calibration, cache['heat_range'], cache['heat_value'], cache['sw_error'])
+            self._set_calibration_data(*self._raw_calibration)
+            self.ambient_temperature = cache['ambient_temperature']
+            self._heater_values = dict((int(k), v) for k, v in cache['heater'].items())
+        except (KeyError, TypeError, ValueError):
+            return None
+        self.signature = cache['signature']
+        return cache
+
+    def save_calibration_cache(self):
+        """Write calibration, variant and computed heater values to the cache file."""
+        if self.calibration_cache is None:
+            return
+        calibration, heat_range, heat_value, sw_error = self._raw_calibration
+        cache = {
+            'chip_id': self.chip_id,
+            'variant': self._variant,
+            'signature': self.signature,
+            'calibration': binascii.hexlify(bytes(calibration)).decode(),
+            'heat_range': heat_range,
+            'heat_value': heat_value,
+            'sw_error': sw_error,
+            'ambient_temperature': self.ambient_temperature,
+            'heater': dict((str(k), v) for k, v in self._heater_values.items()),
+        }
+        try:
+            with open(self.calibration_cache, 'w') as f:
+                json.dump(cache, f)
+        except OSError:
+            pass
+
     def soft_reset(self):
         """Trigger a soft reset."""
         self._set_regs(constants.SOFT_RESET_ADDR, constants.SOFT_RESET_CMD)
         time.sleep(constants.RESET_PERIOD / 1000.0)
+        self._load_shadow()
+
+    def apply(self):
+        """Write pending configuration changes to the sensor.
+
+        Setters only update the shadow registers; this flushes every changed
+        register in a single I2C write. Triggering a measurement applies
+        pending changes too, so calling this is only needed to push settings
+        without measuring.
+
+        """
+        self._flush_shadow(False)
 
     def set_temp_offset(self, value):
         """Set temperature offset in celsius.
@@ -113,7 +243,7 @@ class BME680(BME680Data):
 
     def get_humidity_oversample(self):
         """Get humidity oversampling."""
-        return (self._get_regs(constants.CONF_OS_H_ADDR, 1) & constants.OSH_MSK) >> constants.OSH_POS
+        return self._get_bits(constants.CONF_OS_H_ADDR, constants.OSH_MSK, constants.OSH_POS)
 
     def set_pressure_oversample(self, value):
         """Set temperature oversampling.
@@ -132,7 +262,7 @@ class BME680(BME680Data):
 
     def get_pressure_oversample(self):
         """Get pressure oversampling."""
-        return (self._get_regs(constants.CONF_T_P_MODE_ADDR, 1) & constants.OSP_MSK) >> constants.OSP_POS
+        return self._get_bits(constants.CONF_T_P_MODE_ADDR, constants.OSP_MSK, constants.OSP_POS)
 
     def set_temperature_oversample(self, value):
         """Set pressure oversampling.
@@ -151,7 +281,7 @@ class BME680(BME680Data):
 
     def get_temperature_oversample(self):
         """Get temperature oversampling."""
-        return (self._get_regs(constants.CONF_T_P_MODE_ADDR, 1) & constants.OST_MSK) >> constants.OST_POS
+        return self._get_bits(constants.CONF_T_P_MODE_ADDR, constants.OST_MSK, constants.OST_POS)
 
     def set_filter(self, value):
         """Set IIR filter size.
@@ -171,7 +301,7 @@ class BME680(BME680Data):
 
     def get_filter(self):
         """Get filter size."""
-        return (self._get_regs(constants.CONF_ODR_FILT_ADDR, 1) & constants.FILTER_MSK) >> constants.FILTER_POS
+        return self._get_bits(constants.CONF_ODR_FILT_ADDR, constants.FILTER_MSK, constants.FILTER_POS)
 
     def select_gas_heater_profile(self, value):
         """Set current gas sensor conversion profile.
@@ -189,7 +319,7 @@ class BME680(BME680Data):
 
     def get_gas_heater_profile(self):
         """Get gas sensor conversion profile: 0 to 9."""
-        return self._get_regs(constants.CONF_ODR_RUN_GAS_NBC_ADDR, 1) & constants.NBCONV_MSK
+        return self._get_bits(constants.CONF_ODR_RUN_GAS_NBC_ADDR, constants.NBCONV_MSK, constants.NBCONV_POS)
 
     def set_gas_heater_status(self, value):
         """Enable/disable gas heater."""
@@ -198,7 +328,7 @@ class BME680(BME680Data):
 
     def get_gas_heater_status(self):
         """Get current heater status."""
-        return (self._get_regs(constants.CONF_HEAT_CTRL_ADDR, 1) & constants.HCTRL_MSK) >> constants.HCTRL_POS
+        return self._get_bits(constants.CONF_HEAT_CTRL_ADDR, constants.HCTRL_MSK, constants.HCTRL_POS)
 
     def set_gas_status(self, value):
         """Enable/disable gas sensor."""
@@ -212,7 +342,7 @@ class BME680(BME680Data):
 
     def get_gas_status(self):
         """Get the current gas status."""
-        return (self._get_regs(constants.CONF_ODR_RUN_GAS_NBC_ADDR, 1) & constants.RUN_GAS_MSK) >> constants.RUN_GAS_POS
+        return self._get_bits(constants.CONF_ODR_RUN_GAS_NBC_ADDR, constants.RUN_GAS_MSK, constants.RUN_GAS_POS)
 
     def set_gas_heater_profile(self, temperature, duration, nb_profile=0):
         """Set temperature and duration of gas sensor heater.
@@ -238,8 +368,11 @@ class BME680(BME680Data):
             raise ValueError('Profile "{}" should be between {} and {}'.format(nb_profile, constants.NBCONV_MIN, constants.NBCONV_MAX))
 
         self.gas_settings.heatr_temp = value
-        temp = int(self._calc_heater_resistance(self.gas_settings.heatr_temp))
-        self._set_regs(constants.RES_HEAT0_ADDR + nb_profile, temp)
+        temp = self._heater_value(value)
+        if temp is None:
+            temp = self._heater_value(value, compute=True)
+            self.save_calibration_cache()
+        self._set_shadow(constants.RES_HEAT0_ADDR + nb_profile, temp)
 
     def set_gas_heater_duration(self, value, nb_profile=0):
         """Set gas sensor heater duration.
@@ -257,8 +390,53 @@ class BME680(BME680Data):
             raise ValueError('Profile "{}" should be between {} and {}'.format(nb_profile, constants.NBCONV_MIN, constants.NBCONV_MAX))
 
         self.gas_settings.heatr_dur = value
+        self._heater_durations[nb_profile] = value
         temp = self._calc_heater_duration(self.gas_settings.heatr_dur)
-        self._set_regs(constants.GAS_WAIT0_ADDR + nb_profile, temp)
+        self._set_shadow(constants.GAS_WAIT0_ADDR + nb_profile, temp)
+
+    def set_gas_heater_sequence(self, steps):
+        """Configure a heater sequence that is stepped through one measurement at a time.
+
+        Step i is stored in heater profile i. All register values are computed
+        here once and written in one burst; after each reading the next
+        profile is selected, and the gas resistance is stored at
+        gas_fingerprint[gas_index]. fingerprint_cycles counts completed passes.
+
+        :param steps: Up to 10 (temperature, duration) pairs, in degrees celsius and milliseconds
+
+        """
+        if not 0 < len(steps) <= constants.NBCONV_MAX + 1:
+            raise ValueError('Sequence should have between 1 and {} steps'.format(constants.NBCONV_MAX + 1))
+
+        new_values = False
+        for nb_profile, (temperature, duration) in enumerate(steps):
+            temp = self._heater_value(temperature)
+            if temp is None:
+                temp = self._heater_value(temperature, compute=True)
+                new_values = True
+            self._set_shadow(constants.RES_HEAT0_ADDR + nb_profile, temp)
+            self._set_shadow(constants.GAS_WAIT0_ADDR + nb_profile, self._calc_heater_duration(duration))
+            self._heater_durations[nb_profile] = duration
+
+        self._sequence_len = len(steps)
+        self.gas_fingerprint = [None] * len(steps)
+        self.fingerprint_cycles = 0
+        self.select_gas_heater_profile(0)
+        self.apply()
+        if new_values:
+            self.save_calibration_cache()
+
+    def clear_gas_heater_sequence(self):
+        """Stop cycling heater profiles, staying on the current one."""
+        self._sequence_len = 0
+
+    def _heater_value(self, temperature, compute=False):
+        """Get the cached heater resistance register value for a temperature, computing it if asked."""
+        temp = self._heater_values.get(temperature)
+        if temp is None and compute:
+            temp = int(self._calc_heater_resistance(temperature))
+            self._heater_values[temperature] = temp
+        return temp
 
     def set_power_mode(self, value, blocking=True):
         """Set power mode."""
@@ -267,7 +445,14 @@ class BME680(BME680Data):
 
         self.power_mode = value
 
-        self._set_bits(constants.CONF_T_P_MODE_ADDR, constants.MODE_MSK, constants.MODE_POS, value)
+        if value == constants.FORCED_MODE:
+            # The sensor drops back to sleep after a forced measurement,
+            # so the trigger is written without being kept in the shadow
+            self._flush_shadow(True)
+            self._triggered_profile = self.gas_settings.nb_conv or 0
+        else:
+            self._set_bits(constants.CONF_T_P_MODE_ADDR, constants.MODE_MSK, constants.MODE_POS, value)
+            self._flush_shadow(False)
 
         while blocking and self.get_power_mode() != self.power_mode:
             time.sleep(constants.POLL_PERIOD_MS / 1000.0)
@@ -277,70 +462,224 @@ class BME680(BME680Data):
         self.power_mode = self._get_regs(constants.CONF_T_P_MODE_ADDR, 1)
         return self.power_mode
 
+    def get_profile_duration(self):
+        """Get the duration of one forced-mode measurement in milliseconds.
+
+        Derived from the oversampling settings and, when gas measurement is
+        enabled, the heater duration, as in the Bosch reference driver.
+        The IIR filter does not lengthen a conversion.
+
+        """
+        meas_cycles = constants.OS_TO_MEAS_CYCLES[self.tph_settings.os_temp or 0]
+        meas_cycles += constants.OS_TO_MEAS_CYCLES[self.tph_settings.os_pres or 0]
+        meas_cycles += constants.OS_TO_MEAS_CYCLES[self.tph_settings.os_hum or 0]
+
+        tph_dur = meas_cycles * 1963
+        tph_dur += 477 * 4  # TPH switching duration
+        tph_dur += 477 * 5  # Gas measurement duration
+        tph_dur += 500  # Round to the closest whole number
+        tph_dur //= 1000  # Convert to ms
+        tph_dur += 1  # Wake up duration
+
+        if self.gas_settings.run_gas:
+            tph_dur += self._heater_durations[self.gas_settings.nb_conv or 0]
+
+        return tph_dur
+
     def get_sensor_data(self):
         """Get sensor data.
 
         Stores data in .data and returns True upon success.
 
         """
-        self.set_power_mode(constants.FORCED_MODE)
+        self.set_power_mode(constants.FORCED_MODE, blocking=False)
 
         for attempt in range(10):
-            status = self._get_regs(constants.FIELD0_ADDR, 1)
+            if self._read_field_data():
+                return True
+            time.sleep(constants.POLL_PERIOD_MS / 1000.0)
 
-            if (status & constants.NEW_DATA_MSK) == 0:
-                time.sleep(constants.POLL_PERIOD_MS / 1000.0)
-                continue
+        return False
 
-            regs = self._get_regs(constants.FIELD0_ADDR, constants.FIELD_LENGTH)
+    def trigger(self):
+        """Start a forced-mode measurement without waiting for it.
 
-            self.data.status = regs[0] & constants.NEW_DATA_MSK
-            # Contains the nb_profile used to obtain the current measurement
-            self.data.gas_index = regs[0] & constants.GAS_INDEX_MSK
-            self.data.meas_index = regs[1]
+        The result is ready get_profile_duration() ms later; read it then with
+        get_triggered_data. Unlike get_sensor_data, which polls for at most
+        100 ms, this leaves the wait to the caller.
 
-            adc_pres = (regs[2] << 12) | (regs[3] << 4) | (regs[4] >> 4)
-            adc_temp = (regs[5] << 12) | (regs[6] << 4) | (regs[7] >> 4)
-            adc_hum = (regs[8] << 8) | regs[9]
-            adc_gas_res_low = (regs[13] << 2) | (regs[14] >> 6)
-            adc_gas_res_high = (regs[15] << 2) | (regs[16] >> 6)
-            gas_range_l = regs[14] & constants.GAS_RANGE_MSK
-            gas_range_h = regs[16] & constants.GAS_RANGE_MSK
+        """
+        self.set_power_mode(constants.FORCED_MODE, blocking=False)
 
-            if self._variant == constants.VARIANT_HIGH:
-                self.data.status |= regs[16] & constants.GASM_VALID_MSK
-                self.data.status |= regs[16] & constants.HEAT_STAB_MSK
-            else:
-                self.data.status |= regs[14] & constants.GASM_VALID_MSK
-                self.data.status |= regs[14] & constants.HEAT_STAB_MSK
+    def get_triggered_data(self):
+        """Read the measurement started by trigger, without triggering another.
 
-            self.data.heat_stable = (self.data.status & constants.HEAT_STAB_MSK) > 0
+        Stores data in .data and returns True upon success, False if no new
+        data is ready, including while the conversion is still running.
 
-            temperature = self._calc_temperature(adc_temp)
-            self.data.temperature = temperature / 100.0
-            self.ambient_temperature = temperature  # Saved for heater calc
+        """
+        return self._read_field_data()
 
-            self.data.pressure = self._calc_pressure(adc_pres) / 100.0
-            self.data.humidity = self._calc_humidity(adc_hum) / 1000.0
+    async def read(self):
+        """Get sensor data without blocking the event loop.
 
-            if self._variant == constants.VARIANT_HIGH:
-                self.data.gas_resistance = self._calc_gas_resistance_high(adc_gas_res_high, gas_range_h)
-            else:
-                self.data.gas_resistance = self._calc_gas_resistance_low(adc_gas_res_low, gas_range_l)
+        Triggers a forced measurement and awaits its computed duration
+        before reading, so other coroutines run during the conversion.
+        Stores data in .data and returns True upon success.
 
-            return True
+        """
+        self.set_power_mode(constants.FORCED_MODE, blocking=False)
+        await asyncio.sleep(self.get_profile_duration() / 1000.0)
+
+        for attempt in range(10):
+            if self._read_field_data():
+                return True
+            await asyncio.sleep(constants.POLL_PERIOD_MS / 1000.0)
 
         return False
 
+    def _read_field_data(self):
+        """Read and compensate field data, returning False if no new data is ready.
+
+        The status byte and the fields come from a single burst read into a
+        preallocated buffer.
+
+        """
+        regs = self._field_buf
+        self._i2c.readfrom_mem_into(self.i2c_addr, constants.FIELD0_ADDR, regs)
+        self.i2c_transactions += 1
+
+        # New data stays flagged from the previous conversion while the next one
+        # runs, so a read during a conversion would return stale data as new
+        if (regs[0] & (constants.NEW_DATA_MSK | constants.MEASURING_MSK)) != constants.NEW_DATA_MSK:
+            return False
+
+        self.data.status = regs[0] & constants.NEW_DATA_MSK
+        # Contains the nb_profile used to obtain the current measurement
+        self.data.gas_index = regs[0] & constants.GAS_INDEX_MSK
+        self.data.meas_index = regs[1]
+
+        adc_pres = (regs[2] << 12) | (regs[3] << 4) | (regs[4] >> 4)
+        adc_temp = (regs[5] << 12) | (regs[6] << 4) | (regs[7] >> 4)
+        adc_hum = (regs[8] << 8) | regs[9]
+        adc_gas_res_low = (regs[13] << 2) | (regs[14] >> 6)
+        adc_gas_res_high = (regs[15] << 2) | (regs[16] >> 6)
+        gas_range_l = regs[14] & constants.GAS_RANGE_MSK
+        gas_range_h = regs[16] & constants.GAS_RANGE_MSK
+
+        if self._variant == constants.VARIANT_HIGH:
+            self.data.status |= regs[16] & constants.GASM_VALID_MSK
+            self.data.status |= regs[16] & constants.HEAT_STAB_MSK
+        else:
+            self.data.status |= regs[14] & constants.GASM_VALID_MSK
+            self.data.status |= regs[14] & constants.HEAT_STAB_MSK
+
+        self.data.heat_stable = (self.data.status & constants.HEAT_STAB_MSK) > 0
+
+        temperature = self._calc_temperature(adc_temp)
+        self.data.temperature = temperature / 100.0
+        self.ambient_temperature = temperature  # Saved for heater calc
+
+        self.data.pressure = self._calc_pressure(adc_pres) / 100.0
+        self.data.humidity = self._calc_humidity(adc_hum) / 1000.0
+
+        if self._variant == constants.VARIANT_HIGH:
+            self.data.gas_resistance = self._calc_gas_resistance_high(adc_gas_res_high, gas_range_h)
+        else:
+            self.data.gas_resistance = self._calc_gas_resistance_low(adc_gas_res_low, gas_range_l)
+
+        if self._sequence_len:
+            self._advance_heater_sequence()
+
+        return True
+
+    def _advance_heater_sequence(self):
+        """Record the reading in the gas fingerprint and select the next heater step.
+
+        The reading can be from an earlier trigger than the last one, as when
+        a trigger lands during a conversion and is ignored, so the next step
+        follows the profile last triggered rather than the reading's gas_index.
+
+        """
+        index = self.data.gas_index
+        if index < self._sequence_len:
+            self.gas_fingerprint[index] = self.data.gas_resistance
+        triggered = self._triggered_profile
+        if triggered is None:
+            return
+        self._triggered_profile = None
+        if index >= self._sequence_len - 1:
+            self.fingerprint_cycles += 1
+        self.select_gas_heater_profile(triggered + 1 if triggered + 1 < self._sequence_len else 0)
+
     def _set_bits(self, register, mask, position, value):
-        """Mask out and set one or more bits in a register."""
-        temp = self._get_regs(register, 1)
-        temp &= ~mask
-        temp |= value << position
-        self._set_regs(register, temp)
+        """Mask out and set one or more bits in a shadowed register."""
+        index = register - constants.ADDR_SENS_CONF_START
+        self._set_shadow(register, (self._shadow[index] & ~mask) | (value << position))
+
+    def _get_bits(self, register, mask, position):
+        """Get one or more bits of a shadowed register."""
+        return (self._shadow[register - constants.ADDR_SENS_CONF_START] & mask) >> position
+
+    def _set_shadow(self, register, value):
+        """Set a shadowed register and mark it for the next flush if its value changed."""
+        index = register - constants.ADDR_SENS_CONF_START
+        value &= 0xff
+        if self._shadow[index] == value:
+            return
+        self._shadow[index] = value
+        self._dirty |= 1 << index
+
+    def _load_shadow(self):
+        """Read all shadowed registers from the sensor in one burst."""
+        self._shadow[:] = self._i2c.readfrom_mem(self.i2c_addr, constants.ADDR_SENS_CONF_START, constants.CONF_REGS_LEN)
+        self.i2c_transactions += 1
+        self._dirty = 0
+
+    def _flush_shadow(self, trigger):
+        """Write the dirty shadowed registers, and optionally a forced-mode trigger, in one transaction.
+
+        The BME680 does not auto-increment on I2C writes, so the burst is a
+        sequence of (register, value) pairs. ctrl_meas goes last so that
+        ctrl_hum and the other settings are latched by it.
+
+        """
+        mode_index = constants.CONF_T_P_MODE_ADDR - constants.ADDR_SENS_CONF_START
+        dirty = self._dirty
+        if trigger:
+            dirty |= 1 << mode_index
+        if not dirty:
+            return
+
+        if dirty == 1 << mode_index and trigger:
+            # Plain per-sample trigger: a single register, no allocation
+            buf = self._trigger_buf
+            buf[0] = constants.CONF_T_P_MODE_ADDR
+            buf[1] = (self._shadow[mode_index] & ~constants.MODE_MSK) | (constants.FORCED_MODE << constants.MODE_POS)
+            self._i2c.writeto(self.i2c_addr, buf)
+            self.i2c_transactions += 1
+            self._dirty = 0
+            return
+
+        buf = bytearray()
+        for index in range(constants.CONF_REGS_LEN):
+            if index != mode_index and dirty & (1 << index):
+                buf.append(constants.ADDR_SENS_CONF_START + index)
+                buf.append(self._shadow[index])
+        if dirty & (1 << mode_index):
+            value = self._shadow[mode_index]
+            if trigger:
+                value = (value & ~constants.MODE_MSK) | (constants.FORCED_MODE << constants.MODE_POS)
+            buf.append(constants.CONF_T_P_MODE_ADDR)
+            buf.append(value)
+
+        self._i2c.writeto(self.i2c_addr, buf)
+        self.i2c_transactions += 1
+        self._dirty = 0
 
     def _set_regs(self, register, value):
         """Set one or more registers."""
+        self.i2c_transactions += 1
         if isinstance(value, int):
             self._i2c.writeto_mem(self.i2c_addr, register, value.to_bytes(1,'little'))
         else:
@@ -348,75 +687,29 @@ class BME680(BME680Data):
 
     def _get_regs(self, register, length):
         """Get one or more registers."""
+        self.i2c_transactions += 1
         if length == 1:
-            return self._i2c.readfrom_mem(self.i2c_addr, register,1)[0]
+            self._i2c.readfrom_mem_into(self.i2c_addr, register, self._reg_buf)
+            return self._reg_buf[0]
         else:
             return list(self._i2c.readfrom_mem(self.i2c_addr, register, length))
 
     def _calc_temperature(self, temperature_adc):
         """Convert the raw temperature to degrees C using calibration_data."""
-        var1 = (temperature_adc >> 3) - (self.calibration_data.par_t1 << 1)
-        var2 = (var1 * self.calibration_data.par_t2) >> 11
-        var3 = ((var1 >> 1) * (var1 >> 1)) >> 12
-        var3 = ((var3) * (self.calibration_data.par_t3 << 4)) >> 14
+        calc_temp = self._compensation.temperature(temperature_adc, self.offset_temp_in_t_fine)
 
         # Save teperature data for pressure calculations
-        self.calibration_data.t_fine = (var2 + var3) + self.offset_temp_in_t_fine
-        calc_temp = (((self.calibration_data.t_fine * 5) + 128) >> 8)
+        self.calibration_data.t_fine = self._compensation.t_fine
 
         return calc_temp
 
     def _calc_pressure(self, pressure_adc):
         """Convert the raw pressure using calibration data."""
-        var1 = ((self.calibration_data.t_fine) >> 1) - 64000
-        var2 = ((((var1 >> 2) * (var1 >> 2)) >> 11) *
-                self.calibration_data.par_p6) >> 2
-        var2 = var2 + ((var1 * self.calibration_data.par_p5) << 1)
-        var2 = (var2 >> 2) + (self.calibration_data.par_p4 << 16)
-        var1 = (((((var1 >> 2) * (var1 >> 2)) >> 13) *
-                ((self.calibration_data.par_p3 << 5)) >> 3) +
-                ((self.calibration_data.par_p2 * var1) >> 1))
-        var1 = var1 >> 18
-
-        var1 = ((32768 + var1) * self.calibration_data.par_p1) >> 15
-        calc_pressure = 1048576 - pressure_adc
-        calc_pressure = ((calc_pressure - (var2 >> 12)) * (3125))
-
-        if calc_pressure >= (1 << 31):
-            calc_pressure = ((calc_pressure // var1) << 1)
-        else:
-            calc_pressure = ((calc_pressure << 1) // var1)
-
-        var1 = (self.calibration_data.par_p9 * (((calc_pressure >> 3) *
-                (calc_pressure >> 3)) >> 13)) >> 12
-        var2 = ((calc_pressure >> 2) *
-                self.calibration_data.par_p8) >> 13
-        var3 = ((calc_pressure >> 8) * (calc_pressure >> 8) *
-                (calc_pressure >> 8) *
-                self.calibration_data.par_p10) >> 17
-
-        calc_pressure = (calc_pressure) + ((var1 + var2 + var3 +
-                                           (self.calibration_data.par_p7 << 7)) >> 4)
-
-        return calc_pressure
+        return self._compensation.pressure(pressure_adc)
 
     def _calc_humidity(self, humidity_adc):
         """Convert the raw humidity using calibration data."""
-        temp_scaled = ((self.calibration_data.t_fine * 5) + 128) >> 8
-        var1 = (humidity_adc - ((self.calibration_data.par_h1 * 16))) -\
-               (((temp_scaled * self.calibration_data.par_h3) // (100)) >> 1)
-        var2 = (self.calibration_data.par_h2 *
-                (((temp_scaled * self.calibration_data.par_h4) // (100)) +
-                 (((temp_scaled * ((temp_scaled * self.calibration_data.par_h5) // (100))) >> 6) //
-                 (100)) + (1 * 16384))) >> 10
-        var3 = var1 * var2
-        var4 = self.calibration_data.par_h6 << 7
-        var4 = ((var4) + ((temp_scaled * self.calibration_data.par_h7) // (100))) >> 4
-        var5 = ((var3 >> 14) * (var3 >> 14)) >> 10
-        var6 = (var4 * var5) >> 1
-        calc_hum = (((var3 + var6) >> 10) * (1000)) >> 12
-
-        return min(max(calc_hum, 0), 100000)
+        return self._compensation.humidity(humidity_adc)
 
     def _calc_gas_resistance(self, gas_res_adc, gas_range):
         """Convert the raw gas resistance using calibration data."""
@@ -448,15 +741,7 @@ class BME680(BME680Data):
         Applies to Variant ID == 0x00 only.
 
         """
-        var1 = ((1340 + (5 * self.calibration_data.range_sw_err)) * (lookupTable1[gas_range])) >> 16
-        var2 = (((gas_res_adc << 15) - (16777216)) + var1)
-        var3 = ((lookupTable2[gas_range] * var1) >> 9)
-        calc_gas_res = ((var3 + (var2 >> 1)) / var2)
-
-        if calc_gas_res < 0:
-            calc_gas_res = (1 << 32) + calc_gas_res
-
-        return calc_gas_res
+        return self._compensation.gas_resistance_low(gas_res_adc, gas_range)
 
     def _calc_heater_resistance(self, temperature):
         """Convert raw heater resistance using calibration data."""
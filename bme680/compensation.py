@@ -0,0 +1,193 @@
+"""BME680 compensation formulas with calibration-derived constants precomputed."""
+from .constants import lookupTable1, lookupTable2
+
+
+class IntegerCompensation:
+    """Bosch integer compensation.
+
+    Built once from CalibrationData; every subexpression that depends only on
+    calibration is folded into an attribute so a sample does no shifting or
+    scaling of coefficients.
+
+    Results use the driver's raw units: temperature in degrees C x100,
+    pressure in Pa, humidity in %RH x1000 and gas resistance in Ohms.
+
+    """
+
+    def __init__(self, calibration_data):  # noqa D107
+        c = calibration_data
+
+        self.par_t1_x2 = c.par_t1 << 1
+        self.par_t2 = c.par_t2
+        self.par_t3_x16 = c.par_t3 << 4
+
+        self.par_p1 = c.par_p1
+        self.par_p2 = c.par_p2
+        self.par_p3_x32 = c.par_p3 << 5
+        self.par_p4_x65536 = c.par_p4 << 16
+        self.par_p5 = c.par_p5
+        self.par_p6 = c.par_p6
+        self.par_p7_x128 = c.par_p7 << 7
+        self.par_p8 = c.par_p8
+        self.par_p9 = c.par_p9
+        self.par_p10 = c.par_p10
+
+        self.par_h1_x16 = c.par_h1 * 16
+        self.par_h2 = c.par_h2
+        self.par_h3 = c.par_h3
+        self.par_h4 = c.par_h4
+        self.par_h5 = c.par_h5
+        self.par_h6_x128 = c.par_h6 << 7
+        self.par_h7 = c.par_h7
+
+        self.gas_range_sw = 1340 + (5 * c.range_sw_err)
+
+        self.t_fine = 0
+
+    def temperature(self, temperature_adc, offset_t_fine=0):
+        """Convert the raw temperature, saving t_fine for pressure and humidity."""
+        var1 = (temperature_adc >> 3) - self.par_t1_x2
+        var2 = (var1 * self.par_t2) >> 11
+        var3 = ((var1 >> 1) * (var1 >> 1)) >> 12
+        var3 = (var3 * self.par_t3_x16) >> 14
+
+        t_fine = (var2 + var3) + offset_t_fine
+        self.t_fine = t_fine
+        return ((t_fine * 5) + 128) >> 8
+
+    def pressure(self, pressure_adc):
+        """Convert the raw pressure."""
+        var1 = (self.t_fine >> 1) - 64000
+        var1_sq = (var1 >> 2) * (var1 >> 2)
+        var2 = ((var1_sq >> 11) * self.par_p6) >> 2
+        var2 = var2 + ((var1 * self.par_p5) << 1)
+        var2 = (var2 >> 2) + self.par_p4_x65536
+        var1 = ((((var1_sq >> 13) * self.par_p3_x32) >> 3) +
+                ((self.par_p2 * var1) >> 1))
+        var1 = var1 >> 18
+
+        var1 = ((32768 + var1) * self.par_p1) >> 15
+        calc_pressure = 1048576 - pressure_adc
+        calc_pressure = ((calc_pressure - (var2 >> 12)) * (3125))
+
+        if calc_pressure >= (1 << 31):
+            calc_pressure = ((calc_pressure // var1) << 1)
+        else:
+            calc_pressure = ((calc_pressure << 1) // var1)
+
+        var1 = (self.par_p9 * (((calc_pressure >> 3) *
+                (calc_pressure >> 3)) >> 13)) >> 12
+        var2 = ((calc_pressure >> 2) * self.par_p8) >> 13
+        var3 = (calc_pressure >> 8)
+        var3 = (var3 * var3 * var3 * self.par_p10) >> 17
+
+        return calc_pressure + ((var1 + var2 + var3 + self.par_p7_x128) >> 4)
+
+    def humidity(self, humidity_adc):
+        """Convert the raw humidity."""
+        temp_scaled = ((self.t_fine * 5) + 128) >> 8
+        var1 = (humidity_adc - self.par_h1_x16) -\
+               (((temp_scaled * self.par_h3) // (100)) >> 1)
+        var2 = (self.par_h2 *
+                (((temp_scaled * self.par_h4) // (100)) +
+                 (((temp_scaled * ((temp_scaled * self.par_h5) // (100))) >> 6) //
+                 (100)) + (1 * 16384))) >> 10
+        var3 = var1 * var2
+        var4 = (self.par_h6_x128 + ((temp_scaled * self.par_h7) // (100))) >> 4
+        var5 = ((var3 >> 14) * (var3 >> 14)) >> 10
+        var6 = (var4 * var5) >> 1
+        calc_hum = (((var3 + var6) >> 10) * (1000)) >> 12
+
+        return min(max(calc_hum, 0), 100000)
+
+    def gas_resistance_low(self, gas_res_adc, gas_range):
+        """Convert the raw gas resistance. Applies to Variant ID == 0x00 only."""
+        var1 = (self.gas_range_sw * (lookupTable1[gas_range])) >> 16
+        var2 = (((gas_res_adc << 15) - (16777216)) + var1)
+        var3 = ((lookupTable2[gas_range] * var1) >> 9)
+        calc_gas_res = ((var3 + (var2 >> 1)) / var2)
+
+        if calc_gas_res < 0:
+            calc_gas_res = (1 << 32) + calc_gas_res
+
+        return calc_gas_res
+
+
+class FloatCompensation(IntegerCompensation):
+    """Bosch floating-point reference compensation.
+
+    Faster than the integer formulas on targets with hardware floats, where
+    the integer path spills into arbitrary-precision ints. Returns the same
+    units as IntegerCompensation; t_fine is kept on the same scale so
+    temperature offsets apply unchanged.
+
+    """
+
+    def __init__(self, calibration_data):  # noqa D107
+        IntegerCompensation.__init__(self, calibration_data)
+        c = calibration_data
+
+        self.t1_1024 = c.par_t1 / 1024.0
+        self.t1_8192 = c.par_t1 / 8192.0
+        self.t2 = float(c.par_t2)
+        self.t3_x16 = c.par_t3 * 16.0
+
+        self.p1 = float(c.par_p1)
+        self.p2 = float(c.par_p2)
+        self.p3 = c.par_p3 / 16384.0
+        self.p4 = c.par_p4 * 65536.0
+        self.p5_x2 = c.par_p5 * 2.0
+        self.p6 = c.par_p6 / 131072.0
+        self.p7 = c.par_p7 * 128.0
+        self.p8 = c.par_p8 / 32768.0
+        self.p9 = c.par_p9 / 2147483648.0
+        self.p10 = c.par_p10 / 131072.0
+
+        self.h1_x16 = c.par_h1 * 16.0
+        self.h2 = c.par_h2 / 262144.0
+        self.h3 = c.par_h3 / 2.0
+        self.h4 = c.par_h4 / 16384.0
+        self.h5 = c.par_h5 / 1048576.0
+        self.h6 = c.par_h6 / 16384.0
+        self.h7 = c.par_h7 / 2097152.0
+
+        self.t_fine = 0.0
+
+    def temperature(self, temperature_adc, offset_t_fine=0):
+        """Convert the raw temperature, saving t_fine for pressure and humidity."""
+        var1 = ((temperature_adc / 16384.0) - self.t1_1024) * self.t2
+        var2 = (temperature_adc / 131072.0) - self.t1_8192
+        var2 = (var2 * var2) * self.t3_x16
+
+        t_fine = var1 + var2 + offset_t_fine
+        self.t_fine = t_fine
+        return t_fine / 51.2
+
+    def pressure(self, pressure_adc):
+        """Convert the raw pressure."""
+        var1 = (self.t_fine / 2.0) - 64000.0
+        var2 = var1 * var1 * self.p6
+        var2 = var2 + (var1 * self.p5_x2)
+        var2 = (var2 / 4.0) + self.p4
+        var1 = ((self.p3 * var1 * var1) + (self.p2 * var1)) / 524288.0
+        var1 = (1.0 + (var1 / 32768.0)) * self.p1
+        if var1 == 0:
+            return 0.0
+
+        calc_pressure = 1048576.0 - pressure_adc
+        calc_pressure = ((calc_pressure - (var2 / 4096.0)) * 6250.0) / var1
+        var1 = self.p9 * calc_pressure * calc_pressure
+        var2 = calc_pressure * self.p8
+        var3 = calc_pressure / 256.0
+        var3 = var3 * var3 * var3 * self.p10
+
+        return calc_pressure + (var1 + var2 + var3 + self.p7) / 16.0
+
+    def humidity(self, humidity_adc):
+        """Convert the raw humidity."""
+        temp_comp = self.t_fine / 5120.0
+        var1 = humidity_adc - (self.h1_x16 + (self.h3 * temp_comp))
+        var2 = var1 * (self.h2 * (1.0 + (self.h4 * temp_comp) + (self.h5 * temp_comp * temp_comp)))
+        calc_hum = var2 + ((self.h6 + (self.h7 * temp_comp)) * var2 * var2)
+
+        return min(max(calc_hum * 1000.0, 0.0), 100000.0)
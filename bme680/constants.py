@@ -45,6 +45,8 @@ ADDR_RES_HEAT_RANGE_ADDR = 0x02
 ADDR_RANGE_SW_ERR_ADDR = 0x04
 ADDR_SENS_CONF_START = 0x5A
 ADDR_GAS_CONF_START = 0x64
+# Heater and control registers, 0x5A-0x75, shadowed by the driver
+CONF_REGS_LEN = 28
 
 # Field settings
 FIELD0_ADDR = 0x1d
@@ -93,6 +95,9 @@ OS_4X = 3
 OS_8X = 4
 OS_16X = 5
 
+# Measurement cycles per oversampling setting, indexed by OS_*
+OS_TO_MEAS_CYCLES = (0, 1, 2, 4, 8, 16)
+
 # IIR filter settings
 FILTER_SIZE_0 = 0
 FILTER_SIZE_1 = 1
@@ -160,6 +165,7 @@ MODE_MSK = 0x03
 RHRANGE_MSK = 0x30
 RSERROR_MSK = 0xf0
 NEW_DATA_MSK = 0x80
+MEASURING_MSK = 0x20
 GAS_INDEX_MSK = 0x0f
 GAS_RANGE_MSK = 0x0f
 GASM_VALID_MSK = 0x20
@@ -0,0 +1,100 @@
+"""Several BME680 sensors read with overlapping forced-mode conversions."""
+from . import constants
+import time
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
+
+
+class SensorGroup:
+    """Manage a set of BME680 sensors, possibly spread over several I2C buses.
+
+    All sensors are triggered back to back and the group waits once for the
+    longest conversion, so a cycle costs about one conversion time instead
+    of one per sensor.
+
+    """
+
+    def __init__(self):  # noqa D107
+        # (key, sensor) pairs in trigger order
+        self.sensors = []
+        # meas_index of each sensor's last result, by key
+        self._meas_index = {}
+
+    def add(self, sensor, bus=0):
+        """Add a sensor and return its key.
+
+        :param sensor: An initialised BME680 instance
+        :param bus: Label for the I2C bus the sensor is on, eg. the bus id
+
+        """
+        key = (bus, sensor.i2c_addr)
+        for existing, _ in self.sensors:
+            if existing == key:
+                raise ValueError('Sensor {} already in group'.format(key))
+        self.sensors.append((key, sensor))
+        return key
+
+    def get_cycle_duration(self):
+        """Get the longest forced-mode measurement of the group in milliseconds."""
+        duration = 0
+        for _, sensor in self.sensors:
+            duration = max(duration, sensor.get_profile_duration())
+        return duration
+
+    def read(self):
+        """Measure with every sensor.
+
+        Returns a dict of key to each sensor's .data for the sensors that
+        produced new data. The FieldData objects are the sensors' own and are
+        overwritten by the next read.
+
+        """
+        self._trigger()
+        time.sleep(self.get_cycle_duration() / 1000.0)
+
+        results = {}
+        pending = list(self.sensors)
+        for attempt in range(10):
+            pending = self._collect(pending, results)
+            if not pending:
+                break
+            time.sleep(constants.POLL_PERIOD_MS / 1000.0)
+        return results
+
+    async def read_async(self):
+        """Measure with every sensor without blocking the event loop. See read."""
+        self._trigger()
+        await asyncio.sleep(self.get_cycle_duration() / 1000.0)
+
+        results = {}
+        pending = list(self.sensors)
+        for attempt in range(10):
+            pending = self._collect(pending, results)
+            if not pending:
+                break
+            await asyncio.sleep(constants.POLL_PERIOD_MS / 1000.0)
+        return results
+
+    def _trigger(self):
+        """Start a forced-mode conversion on every sensor."""
+        for _, sensor in self.sensors:
+            sensor.set_power_mode(constants.FORCED_MODE, blocking=False)
+
+    def _collect(self, pending, results):
+        """Burst-read the sensors that are ready, returning those still pending.
+
+        A sensor is ready once its conversion has finished, as _read_field_data
+        checks, and its meas_index has moved on from the last cycle's; a
+        sensor whose trigger was lost still flags the previous result as new.
+
+        """
+        still_pending = []
+        for key, sensor in pending:
+            if sensor._read_field_data() and sensor.data.meas_index != self._meas_index.get(key):
+                self._meas_index[key] = sensor.data.meas_index
+                results[key] = sensor.data
+            else:
+                still_pending.append((key, sensor))
+        return still_pending
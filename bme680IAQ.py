@@ -1,48 +1,346 @@
+import json
 import math
+import os
+import time
+from array import array
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Fast-math tables: saturation density over the BME680's operating range, linearly
+# interpolated, and exp at fixed steps refined with a cubic term
+SAT_T_MIN = -40.0
+SAT_T_MAX = 85.0
+SAT_T_STEP = 0.25
+EXP_STEP = 1 / 16
+
+class RingBuffer:
+    # Fixed-capacity float ring with a running sum, so mean() is O(1) and nothing is allocated per sample.
+    # The sum is compensated (Neumaier), so rounding from adding and removing values does not drift
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self.data = array('d', [0.0] * capacity)
+        self.clear()
+
+    def clear(self):
+        self.start = 0
+        self.count = 0
+        self.total = 0.0
+        self.compensation = 0.0  # low-order bits lost from total
+
+    def __len__(self):
+        return self.count
+
+    def values(self):
+        # Oldest first
+        return [self.data[(self.start + i) % self.capacity] for i in range(self.count)]
+
+    def append(self, value):
+        # Add value as the newest, dropping the oldest when full
+        if self.count < self.capacity:
+            self.data[(self.start + self.count) % self.capacity] = value
+            self.count += 1
+        else:
+            self._add(-self.data[self.start])
+            self.data[self.start] = value
+            self.start = (self.start + 1) % self.capacity
+        self._add(value)
+
+    def replace_oldest(self, value):
+        # Drop the oldest and add value as the newest, keeping the length
+        if self.count == 0:
+            self.append(value)
+            return
+        self._add(-self.data[self.start])
+        self.start = (self.start + 1) % self.capacity
+        self.data[(self.start + self.count - 1) % self.capacity] = value
+        self._add(value)
+
+    def _add(self, value):
+        total = self.total
+        t = total + value
+        if abs(total) >= abs(value):
+            self.compensation += (total - t) + value
+        else:
+            self.compensation += (value - t) + total
+        self.total = t
+
+    def mean(self):
+        return (self.total + self.compensation) / self.count
 
 class IAQTracker:
-    def __init__(self, burn_in_cycles=300, gas_recal_period=3600, ph_slope=0.03):
+    def __init__(self, burn_in_cycles=300, gas_recal_period=3600, ph_slope=0.03, cal_window=100,
+                 baseline_file=None, sensor_id=None, save_interval=3600, max_age=6 * 3600,
+                 adaptive_burn_in=False, min_burn_in_cycles=60, max_burn_in_cycles=None,
+                 burn_in_window=30, burn_in_tolerance=0.01, fast_math=False):
         self.slope = ph_slope
         self.burn_in_cycles = burn_in_cycles
-        self.gas_cal_data = []
+        self.gas_cal_data = RingBuffer(cal_window)  # recent gas values above the ceiling, averaged into gas_ceil
         self.gas_ceil = 0
         self.gas_recal_period = gas_recal_period
         self.gas_recal_step = 0
 
+        # Baseline snapshot: restored at boot to skip burn-in, rewritten at most every save_interval seconds
+        self.baseline_file = baseline_file
+        self.sensor_id = sensor_id  # eg. BME680.signature, so a snapshot is never applied to another sensor
+        self.save_interval = save_interval
+        self.max_age = max_age
+        self.last_save = None
+        self.dirty = False
+
+        # Adaptive burn-in ends once the compensated gas over the last burn_in_window samples
+        # has both drift (between its halves) and spread (std/mean) below burn_in_tolerance,
+        # after at least min_burn_in_cycles; burn_in_cycles then only caps it, at
+        # max_burn_in_cycles (default 3x burn_in_cycles)
+        self.adaptive_burn_in = adaptive_burn_in
+        self.min_burn_in_cycles = min_burn_in_cycles
+        self.burn_in_tolerance = burn_in_tolerance
+        self.burn_in_recent = RingBuffer(burn_in_window) if adaptive_burn_in else None
+        if adaptive_burn_in:
+            self.burn_in_cycles = max_burn_in_cycles if max_burn_in_cycles is not None else 3 * burn_in_cycles
+        # Burn-in report: samples taken and seconds elapsed, set when burn-in ends
+        self.burn_in_samples = 0
+        self.burn_in_start = None
+        self.burn_in_time = None
+
+        # fast_math trades the two exp() calls per sample for table lookups, within 1e-4
+        # relative error on the compensated gas from -40 to 85 C; outside that range the
+        # exact formula is used
+        self.fast_math = fast_math
+        if fast_math:
+            self.buildTables()
+
     def waterSatDensity(self, temp):
         rho_max = (6.112 * 100 * math.exp((17.62 * temp) / (243.12 + temp))) / (461.52 * (temp + 273.15))
         return rho_max
 
+    def buildTables(self):
+        n = int(round((SAT_T_MAX - SAT_T_MIN) / SAT_T_STEP)) + 1
+        self.sat_table = array('f', [self.waterSatDensity(SAT_T_MIN + i * SAT_T_STEP) for i in range(n)])
+        # exp() arguments reach slope * 100 %RH * 10 * the highest density in the table
+        x_max = self.slope * 100 * 10 * max(self.sat_table)
+        self.exp_table = array('f', [math.exp(i * EXP_STEP) for i in range(int(x_max / EXP_STEP) + 2)])
+
+    def waterSatDensityFast(self, temp):
+        pos = (temp - SAT_T_MIN) * (1 / SAT_T_STEP)
+        i = int(pos)
+        table = self.sat_table
+        if pos < 0 or i >= len(table) - 1:
+            return self.waterSatDensity(temp)
+        low = table[i]
+        return low + (table[i + 1] - low) * (pos - i)
+
+    def expFast(self, x):
+        pos = x * (1 / EXP_STEP)
+        i = int(pos)
+        if pos < 0 or i >= len(self.exp_table):
+            return math.exp(x)
+        d = x - i * EXP_STEP
+        return self.exp_table[i] * (1 + d * (1 + d * (0.5 + d * (1 / 6))))
+
     def getIAQ(self, bme_data):
         temp = bme_data.temperature
         hum = bme_data.humidity
         R_gas = bme_data.gas_resistance
 
-        rho_max = self.waterSatDensity(temp)
-        hum_abs = hum * 10 * rho_max
+        if self.fast_math:
+            # waterSatDensityFast and expFast inlined, falling back to them out of range
+            table = self.sat_table
+            pos = (temp - SAT_T_MIN) * (1 / SAT_T_STEP)
+            i = int(pos)
+            if 0 <= pos and i < len(table) - 1:
+                low = table[i]
+                rho_max = low + (table[i + 1] - low) * (pos - i)
+            else:
+                rho_max = self.waterSatDensity(temp)
+            x = self.slope * (hum * 10 * rho_max)
+            table = self.exp_table
+            pos = x * (1 / EXP_STEP)
+            i = int(pos)
+            if 0 <= pos and i < len(table):
+                d = x - i * EXP_STEP
+                comp_gas = R_gas * (table[i] * (1 + d * (1 + d * (0.5 + d * (1 / 6)))))
+            else:
+                comp_gas = R_gas * math.exp(x)
+        else:
+            rho_max = self.waterSatDensity(temp)
+            hum_abs = hum * 10 * rho_max
 
-        comp_gas = R_gas * math.exp(self.slope * hum_abs)
+            comp_gas = R_gas * math.exp(self.slope * hum_abs)
 
         if self.burn_in_cycles > 0:
-            self.burn_in_cycles -= 1
-            if comp_gas > self.gas_ceil:
-                self.gas_cal_data = [comp_gas]
-                self.gas_ceil = comp_gas
+            self.burnInStep(comp_gas)
             return None
         else:
             if comp_gas > self.gas_ceil:
                 self.gas_cal_data.append(comp_gas)
-                if len(self.gas_cal_data) > 100:
-                    del self.gas_cal_data[0]
-                self.gas_ceil = sum(self.gas_cal_data) / len(self.gas_cal_data)
+                self.gas_ceil = self.gas_cal_data.mean()
 
             AQ = min((comp_gas / self.gas_ceil) ** 2, 1) * 100
 
             self.gas_recal_step += 1
             if self.gas_recal_step >= self.gas_recal_period:
                 self.gas_recal_step = 0
-                self.gas_cal_data.append(comp_gas)
-                del self.gas_cal_data[0]
-                self.gas_ceil = sum(self.gas_cal_data) / len(self.gas_cal_data)
+                self.gas_cal_data.replace_oldest(comp_gas)
+                self.gas_ceil = self.gas_cal_data.mean()
+            self.dirty = True
+
+        return AQ
+
+    def burnInStep(self, comp_gas):
+        if self.burn_in_start is None:
+            self.burn_in_start = time.time()
+        self.burn_in_cycles -= 1
+        self.burn_in_samples += 1
+        if comp_gas > self.gas_ceil:
+            self.gas_cal_data.clear()
+            self.gas_cal_data.append(comp_gas)
+            self.gas_ceil = comp_gas
+
+        if self.adaptive_burn_in:
+            self.burn_in_recent.append(comp_gas)
+            if self.burn_in_samples >= self.min_burn_in_cycles and self.burnInConverged():
+                self.burn_in_cycles = 0
+        if self.burn_in_cycles == 0:
+            self.burn_in_time = time.time() - self.burn_in_start
+
+    def burnInConverged(self):
+        recent = self.burn_in_recent
+        n = recent.count
+        if n < recent.capacity:
+            return False
+        mean = recent.mean()
+        half = n // 2
+        older = 0.0
+        newer = 0.0
+        spread = 0.0
+        for i in range(n):
+            value = recent.data[(recent.start + i) % recent.capacity]
+            if i < half:
+                older += value
+            elif i >= n - half:
+                newer += value
+            spread += (value - mean) ** 2
+        drift = abs(newer - older) / half / mean
+        return drift < self.burn_in_tolerance and math.sqrt(spread / n) / mean < self.burn_in_tolerance
+
+    def compensatedGas(self, temperature, humidity, gas_resistance):
+        # Humidity-compensated gas resistance for whole series; vectorized when numpy is available
+        slope = self.slope
+        if self.fast_math:
+            expFast = self.expFast
+            waterSatDensityFast = self.waterSatDensityFast
+            return [R_gas * expFast(slope * (hum * 10 * waterSatDensityFast(temp)))
+                    for temp, hum, R_gas in zip(temperature, humidity, gas_resistance)]
+        if np is not None:
+            # np.exp may round differently from math.exp in the last bit, so results
+            # can be a few ULP off getIAQ's
+            t = np.asarray(temperature, dtype=float)
+            rho_max = (6.112 * 100 * np.exp((17.62 * t) / (243.12 + t))) / (461.52 * (t + 273.15))
+            hum_abs = np.asarray(humidity, dtype=float) * 10 * rho_max
+            return (np.asarray(gas_resistance, dtype=float) * np.exp(slope * hum_abs)).tolist()
+        exp = math.exp
+        waterSatDensity = self.waterSatDensity
+        return [R_gas * exp(slope * (hum * 10 * waterSatDensity(temp)))
+                for temp, hum, R_gas in zip(temperature, humidity, gas_resistance)]
+
+    def getIAQ_batch(self, temperature, humidity, gas_resistance):
+        # Same as calling getIAQ on each sample in turn, state included: returns
+        # the list of AQ values, None while burning in
+        comp = self.compensatedGas(temperature, humidity, gas_resistance)
+        out = [None] * len(comp)
+
+        i = 0
+        n = len(comp)
+        while i < n and self.burn_in_cycles > 0:
+            self.burnInStep(comp[i])
+            i += 1
+
+        cal_data = self.gas_cal_data
+        gas_ceil = self.gas_ceil
+        gas_recal_period = self.gas_recal_period
+        gas_recal_step = self.gas_recal_step
+
+        while i < n:
+            comp_gas = comp[i]
+            if comp_gas > gas_ceil:
+                cal_data.append(comp_gas)
+                gas_ceil = cal_data.mean()
+
+            out[i] = min((comp_gas / gas_ceil) ** 2, 1) * 100
+
+            gas_recal_step += 1
+            if gas_recal_step >= gas_recal_period:
+                gas_recal_step = 0
+                cal_data.replace_oldest(comp_gas)
+                gas_ceil = cal_data.mean()
+            i += 1
+
+        self.gas_ceil = gas_ceil
+        self.gas_recal_step = gas_recal_step
+        if n and self.burn_in_cycles == 0:
+            self.dirty = True
+        return out
+
+    def saveBaseline(self, force=False):
+        # Write the snapshot if the state changed and save_interval has passed since
+        # the last write (force skips the interval, for a clean shutdown).
+        # Returns True if the file was written
+        if self.baseline_file is None or not self.dirty or self.burn_in_cycles > 0:
+            return False
+        now = time.time()
+        if not force and self.last_save is not None and now - self.last_save < self.save_interval:
+            return False
+
+        snapshot = {
+            'sensor_id': self.sensor_id,
+            'time': now,
+            'gas_ceil': self.gas_ceil,
+            'gas_cal_data': self.gas_cal_data.values(),
+            'gas_recal_step': self.gas_recal_step,
+        }
+        # Write then rename, so a reset mid-write leaves the previous snapshot intact.
+        # A full or read-only filesystem only costs the snapshot; it is retried at the
+        # next save_interval
+        tmp = self.baseline_file + '.tmp'
+        try:
+            with open(tmp, 'w') as f:
+                json.dump(snapshot, f)
+            os.rename(tmp, self.baseline_file)
+        except OSError:
+            self.last_save = now
+            return False
+        self.last_save = now
+        self.dirty = False
+        return True
 
-        return AQ
\ No newline at end of file
+    def loadBaseline(self):
+        # Restore a snapshot taken from the same sensor within max_age seconds and end
+        # burn-in. A clock behind the snapshot means the RTC restarted with the board,
+        # as on a Pico without a time source; the downtime is then unknown, so the
+        # snapshot is rejected. Returns True if the baseline was restored
+        if self.baseline_file is None:
+            return False
+        try:
+            with open(self.baseline_file) as f:
+                snapshot = json.load(f)
+            if snapshot['sensor_id'] != self.sensor_id:
+                return False
+            age = time.time() - snapshot['time']
+            if age < 0 or age > self.max_age:
+                return False
+            values = snapshot['gas_cal_data']
+            if not values:
+                return False
+            self.gas_cal_data.clear()
+            for value in values[-self.gas_cal_data.capacity:]:
+                self.gas_cal_data.append(value)
+            self.gas_ceil = snapshot['gas_ceil']
+            self.gas_recal_step = snapshot['gas_recal_step']
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+        self.burn_in_cycles = 0
+        self.last_save = time.time()
+        self.dirty = False
+        return True
@@ -0,0 +1,393 @@
+import os
+import struct
+from array import array
+
+# Segment file layout: one header, then fixed-size records, all little-endian.
+# Header: magic, format version, record size, segment number, time of the first record,
+# 16 reserved bytes
+MAGIC = b'BMEL'
+VERSION = 2  # 2: record CRC starts from CRC_INIT rather than 0
+HEADER_FORMAT = '<4sHHII16s'
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# Record: time, sequence number, temperature, pressure, humidity, gas resistance, AQ
+# (NaN while calibrating), status flags, CRC-8 of the preceding bytes, two spare bytes
+RECORD_FORMAT = '<IIfffffBBBB'
+RECORD_SIZE = struct.calcsize(RECORD_FORMAT)
+CRC_OFFSET = RECORD_SIZE - 3
+
+# Status flags
+FLAG_HEAT_STABLE = 0x01
+FLAG_CALIBRATING = 0x02
+
+# Erase block of the Pico's flash file system; writes are batched to whole blocks
+PAGE_SIZE = 4096
+SEGMENT_SUFFIX = '.bml'
+
+# Sparse index beside each segment: (time, byte offset) of every index_every-th record
+# and of the last record slot, so a time range maps to a byte span by binary search
+INDEX_SUFFIX = '.idx'
+INDEX_FORMAT = '<II'
+INDEX_ENTRY_SIZE = struct.calcsize(INDEX_FORMAT)
+INDEX_EVERY = 32
+
+NAN = float('nan')
+
+# Starting value of the record CRC. Not 0, so that an all-zero record (a preallocated
+# or torn tail) fails its CRC, as does an erased all-0xFF one
+CRC_INIT = 0xFF
+
+def _crcTable():
+    # CRC-8, polynomial 0x07
+    table = bytearray(256)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table[i] = crc
+    return bytes(table)
+
+CRC_TABLE = _crcTable()
+
+def crc8(buf, start, end):
+    crc = CRC_INIT
+    table = CRC_TABLE
+    for i in range(start, end):
+        crc = table[crc ^ buf[i]]
+    return crc
+
+def recordValid(buf, offset=0):
+    # True if the record at offset has a matching CRC; a torn or erased record does not
+    return crc8(buf, offset, offset + CRC_OFFSET) == buf[offset + CRC_OFFSET]
+
+def segmentName(directory, number):
+    return '%s/%08d%s' % (directory, number, SEGMENT_SUFFIX)
+
+def indexName(directory, number):
+    return '%s/%08d%s' % (directory, number, INDEX_SUFFIX)
+
+def headerValid(header):
+    if len(header) < HEADER_SIZE:
+        return False
+    magic, version, record_size = struct.unpack(HEADER_FORMAT, header)[:3]
+    return magic == MAGIC and version == VERSION and record_size == RECORD_SIZE
+
+def bisectLeft(values, x):
+    # First index with values[i] >= x, for ascending values
+    lo = 0
+    hi = len(values)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if values[mid] < x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+def listSegments(directory):
+    # Segment numbers in directory, oldest first
+    numbers = []
+    try:
+        names = os.listdir(directory)
+    except OSError:
+        return numbers
+    for name in names:
+        if name.endswith(SEGMENT_SUFFIX):
+            try:
+                numbers.append(int(name[:-len(SEGMENT_SUFFIX)]))
+            except ValueError:
+                pass
+    numbers.sort()
+    return numbers
+
+class FlashLog:
+    # Append-only reading log in rotating segment files. Records are packed into a
+    # page-sized RAM buffer and written one full page at a time, so each flash block
+    # is programmed once; flush(force=True) writes a partial page, which costs that
+    # block another erase when the rest of the page follows. At most max_segments files
+    # of segment_pages pages are kept, the oldest is deleted on rotation.
+    # flush_interval bounds the data lost on power loss to that many seconds at the
+    # price of partial-page writes; None flushes only full pages. The open segment's
+    # index is kept in RAM and written when the segment completes or the log closes
+    def __init__(self, directory='log', segment_pages=16, max_segments=8, flush_interval=None,
+                 page_size=PAGE_SIZE, index_every=INDEX_EVERY):
+        self.directory = directory
+        self.segment_pages = segment_pages
+        self.max_segments = max_segments
+        self.flush_interval = flush_interval
+        self.page_size = page_size
+        self.index_every = index_every
+        self.buffer = bytearray(page_size)
+        self.fill = 0           # bytes in buffer
+        self.flushed = 0        # bytes of buffer already in the file
+        self.first_time = None  # time of the oldest unflushed record
+        self.segment = None     # open segment number, None until the first append
+        self.pages = 0          # full pages written to the open segment
+        self.segment_records = 0
+        self.last_time = 0
+        self.index_times = array('L')
+        self.index_offsets = array('L')
+        self.records = 0
+        self.bytes_written = 0
+        self.flushes = 0
+        self.erases = 0
+        self.sequence = 0
+        self.segment_number = 0
+        self.recover()
+
+    def recover(self):
+        # Continue numbering after the newest segment's last valid record. Appending
+        # always starts a new segment, so a page torn by power loss is never rewritten
+        try:
+            os.mkdir(self.directory)
+        except OSError:
+            pass
+        numbers = listSegments(self.directory)
+        if not numbers:
+            return False
+        self.segment_number = numbers[-1] + 1
+        for number in reversed(numbers):
+            last = self.lastRecord(segmentName(self.directory, number))
+            if last is not None:
+                self.sequence = last[1] + 1
+                return True
+        return False
+
+    def lastRecord(self, path):
+        # Newest record in a segment with a valid CRC, or None
+        try:
+            with open(path, 'rb') as f:
+                if not headerValid(f.read(HEADER_SIZE)):
+                    return None
+                count = (os.stat(path)[6] - HEADER_SIZE) // RECORD_SIZE
+                record = bytearray(RECORD_SIZE)
+                for i in range(count - 1, -1, -1):
+                    f.seek(HEADER_SIZE + i * RECORD_SIZE)
+                    if f.readinto(record) == RECORD_SIZE and recordValid(record):
+                        return struct.unpack(RECORD_FORMAT, record)
+        except OSError:
+            pass
+        return None
+
+    def append(self, t, temperature, pressure, humidity, gas, aq, flags=FLAG_HEAT_STABLE):
+        # Buffer one reading; aq None is stored as NaN and flagged as calibrating.
+        # Returns True if a page went to flash
+        if self.segment is None:
+            self.startSegment(t)
+        if aq is None:
+            aq = NAN
+            flags |= FLAG_CALIBRATING
+        buf = self.buffer
+        offset = self.fill
+        if self.segment_records % self.index_every == 0:
+            self.index_times.append(int(t))
+            self.index_offsets.append(self.pages * self.page_size + offset)
+        self.segment_records += 1
+        self.last_time = int(t)
+        struct.pack_into(RECORD_FORMAT, buf, offset, int(t), self.sequence,
+                         temperature, pressure, humidity, gas, aq, flags, 0, 0, 0)
+        buf[offset + CRC_OFFSET] = crc8(buf, offset, offset + CRC_OFFSET)
+        self.fill = offset + RECORD_SIZE
+        self.sequence += 1
+        self.records += 1
+        if self.first_time is None:
+            self.first_time = t
+
+        if self.fill + RECORD_SIZE > self.page_size:
+            self.flush(force=True)
+            return True
+        if self.flush_interval is not None and t - self.first_time >= self.flush_interval:
+            self.flush(force=True)
+            return True
+        return False
+
+    def startSegment(self, t):
+        # Rotate out the oldest segments and put the new segment's header in the buffer
+        numbers = listSegments(self.directory)
+        for number in numbers[:max(0, len(numbers) - self.max_segments + 1)]:
+            os.remove(segmentName(self.directory, number))
+            try:
+                os.remove(indexName(self.directory, number))
+            except OSError:
+                pass
+        self.segment = self.segment_number
+        self.segment_number += 1
+        self.pages = 0
+        self.segment_records = 0
+        self.index_times = array('L')
+        self.index_offsets = array('L')
+        struct.pack_into(HEADER_FORMAT, self.buffer, 0, MAGIC, VERSION, RECORD_SIZE, self.segment, int(t), b'')
+        self.fill = HEADER_SIZE
+        self.flushed = 0
+
+    def flush(self, force=False):
+        # Write buffered records; without force only a full page is written
+        if self.segment is None or self.fill == self.flushed:
+            return False
+        full = self.fill + RECORD_SIZE > self.page_size
+        if not (full or force):
+            return False
+        with open(segmentName(self.directory, self.segment), 'ab') as f:
+            f.write(memoryview(self.buffer)[self.flushed:self.fill])
+        self.bytes_written += self.fill - self.flushed
+        self.flushes += 1
+        self.erases += 1
+        self.first_time = None
+        if full:
+            if self.pages + 1 >= self.segment_pages:
+                self.writeIndex()
+                self.segment = None
+            self.fill = 0
+            self.flushed = 0
+            self.pages += 1
+        else:
+            self.flushed = self.fill
+        return True
+
+    def close(self):
+        self.flush(force=True)
+        if self.segment is not None and self.segment_records:
+            self.writeIndex()
+
+    def segmentEnd(self):
+        # Offset just past the open segment's last record, flushed or not
+        return self.pages * self.page_size + self.fill
+
+    def openIndex(self):
+        # The open segment's index with its last record appended
+        times = array('L', self.index_times)
+        offsets = array('L', self.index_offsets)
+        times.append(self.last_time)
+        offsets.append(self.segmentEnd() - RECORD_SIZE)
+        return times, offsets
+
+    def writeIndex(self):
+        times, offsets = self.openIndex()
+        self.saveIndex(self.segment, times, offsets)
+
+    def saveIndex(self, number, times, offsets):
+        data = bytearray(INDEX_ENTRY_SIZE * len(times))
+        for i in range(len(times)):
+            struct.pack_into(INDEX_FORMAT, data, i * INDEX_ENTRY_SIZE, times[i], offsets[i])
+        with open(indexName(self.directory, number), 'wb') as f:
+            f.write(data)
+        self.bytes_written += len(data)
+        self.flushes += 1
+        self.erases += 1
+
+    def readIndex(self, number):
+        try:
+            with open(indexName(self.directory, number), 'rb') as f:
+                data = f.read()
+        except OSError:
+            return None
+        count = len(data) // INDEX_ENTRY_SIZE
+        times = array('L', [0] * count)
+        offsets = array('L', [0] * count)
+        for i in range(count):
+            times[i], offsets[i] = struct.unpack_from(INDEX_FORMAT, data, i * INDEX_ENTRY_SIZE)
+        return times, offsets
+
+    def rebuildIndex(self, number, write=True):
+        # Index a closed segment from its records, skipping entries whose record fails
+        # its CRC; the last entry is the last record slot with the newest valid time.
+        # Returns (times, offsets), None if the segment is unreadable
+        path = segmentName(self.directory, number)
+        times = array('L')
+        offsets = array('L')
+        record = bytearray(RECORD_SIZE)
+        try:
+            with open(path, 'rb') as f:
+                if not headerValid(f.read(HEADER_SIZE)):
+                    return None
+                count = (os.stat(path)[6] - HEADER_SIZE) // RECORD_SIZE
+                for i in range(0, count, self.index_every):
+                    f.seek(HEADER_SIZE + i * RECORD_SIZE)
+                    if f.readinto(record) == RECORD_SIZE and recordValid(record):
+                        times.append(struct.unpack_from('<I', record)[0])
+                        offsets.append(HEADER_SIZE + i * RECORD_SIZE)
+        except OSError:
+            return None
+        last = self.lastRecord(path)
+        if last is not None:
+            times.append(last[0])
+            offsets.append(HEADER_SIZE + (count - 1) * RECORD_SIZE)
+            if write:
+                self.saveIndex(number, times, offsets)
+        return times, offsets
+
+    def loadIndex(self, number):
+        # (times, offsets) of a segment: the open one from RAM, others from the index
+        # file, rebuilt if it is missing or does not match the segment's size
+        if number == self.segment:
+            return self.openIndex()
+        try:
+            size = os.stat(segmentName(self.directory, number))[6]
+        except OSError:
+            return None
+        end = HEADER_SIZE + (size - HEADER_SIZE) // RECORD_SIZE * RECORD_SIZE
+        index = self.readIndex(number)
+        if index is not None and index[1] and index[1][0] == HEADER_SIZE and index[1][-1] + RECORD_SIZE == end:
+            return index
+        return self.rebuildIndex(number)
+
+    def query(self, start=None, end=None):
+        # Generate records with start <= time < end as tuples in RECORD_FORMAT order,
+        # oldest segment first, including records still in the buffer. A binary search
+        # of each index narrows the reads to the span holding the range: O(log n + k).
+        # Times only increase within a segment; across segments they restart with the RTC
+        numbers = listSegments(self.directory)
+        if self.segment is not None and self.segment not in numbers:
+            numbers.append(self.segment)
+        for number in numbers:
+            index = self.loadIndex(number)
+            if not index or not index[0]:
+                continue
+            times, offsets = index
+            if (start is not None and times[-1] < start) or (end is not None and times[0] >= end):
+                continue
+            i = 0 if start is None else bisectLeft(times, start)
+            j = len(times) if end is None else bisectLeft(times, end)
+            lo = offsets[i - 1] if i > 0 else offsets[0]
+            hi = offsets[j] if j < len(times) else offsets[-1] + RECORD_SIZE
+            yield from self.readRecords(number, lo, hi, start, end)
+
+    def readRecords(self, number, lo, hi, start, end):
+        # Valid records in [lo, hi) of a segment within the time range; the open
+        # segment's unflushed tail comes from the buffer
+        if number == self.segment:
+            base = self.pages * self.page_size
+            file_end = base + self.flushed
+        else:
+            base = None
+            file_end = hi
+        offset = lo
+        if offset < file_end:
+            record = bytearray(RECORD_SIZE)
+            with open(segmentName(self.directory, number), 'rb') as f:
+                f.seek(offset)
+                while offset < min(hi, file_end) and f.readinto(record) == RECORD_SIZE:
+                    if recordValid(record):
+                        fields = struct.unpack(RECORD_FORMAT, record)
+                        if (start is None or fields[0] >= start) and (end is None or fields[0] < end):
+                            yield fields
+                    offset += RECORD_SIZE
+        while base is not None and offset < hi:
+            if recordValid(self.buffer, offset - base):
+                fields = struct.unpack_from(RECORD_FORMAT, self.buffer, offset - base)
+                if (start is None or fields[0] >= start) and (end is None or fields[0] < end):
+                    yield fields
+            offset += RECORD_SIZE
+
+    def stats(self):
+        # Erases count one per block program, as a copy-on-write file system rewrites a
+        # block per modified block; write amplification is bytes erased per byte written,
+        # 1.0 with full pages only
+        return {
+            'records': self.records,
+            'bytes_written': self.bytes_written,
+            'flushes': self.flushes,
+            'erases': self.erases,
+            'write_amplification': self.erases * self.page_size / self.bytes_written if self.bytes_written else 0.0,
+            'segments': len(listSegments(self.directory)),
+            'buffered': self.fill - self.flushed,
+        }
@@ -0,0 +1,72 @@
+"""Host-side emulation of the Pico, the BME680 and the 2.9" e-paper panel.
+
+Lets main.py, bme680 and epaper_display run unchanged on a PC:
+
+    import emulator
+    board = emulator.install()
+    from epaper_display import EpaperDisplay
+    ...
+    print(board.stats(), board.epd.stats())
+
+install() puts the machine, framebuf and utime shims into sys.modules and,
+with a virtual clock, routes time.sleep/time.time through it too, so sleeps
+advance emulated time instead of blocking.
+
+"""
+import sys
+import time as _time
+
+from . import board as _board
+from .board import Board
+from .clock import Clock
+
+_saved = None
+
+
+def install(board=None, virtual_time=True):
+    """Install the shims and make board the current board.
+
+    :param board: Board to use, defaults to Board.pico_room_monitor()
+    :param virtual_time: With a new default board, use a virtual clock
+
+    """
+    global _saved
+    from . import framebuf, machine, utime
+
+    if board is None:
+        board = Board.pico_room_monitor(Clock(virtual=virtual_time))
+    _board.set_current(board)
+
+    if _saved is None:
+        _saved = {
+            'modules': dict((name, sys.modules.get(name)) for name in ('machine', 'framebuf', 'utime')),
+            'sleep': _time.sleep,
+            'time': _time.time,
+        }
+    sys.modules['machine'] = machine
+    sys.modules['framebuf'] = framebuf
+    sys.modules['utime'] = utime
+
+    if board.clock.virtual:
+        _time.sleep = utime.sleep
+        _time.time = board.clock.time
+    else:
+        _time.sleep = _saved['sleep']
+        _time.time = _saved['time']
+    return board
+
+
+def uninstall():
+    """Restore the modules and time functions replaced by install()."""
+    global _saved
+    if _saved is None:
+        return
+    for name, module in _saved['modules'].items():
+        if module is None:
+            sys.modules.pop(name, None)
+        else:
+            sys.modules[name] = module
+    _time.sleep = _saved['sleep']
+    _time.time = _saved['time']
+    _saved = None
+    _board.set_current(None)
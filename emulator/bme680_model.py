@@ -0,0 +1,204 @@
+"""Register-level BME680 model."""
+from bme680 import constants
+from bme680.compensation import IntegerCompensation
+
+# Calibration dump of a real BME680 (variant 0x00)
+CALIBRATION_BLOCK1 = bytes([
+    0x3d, 0xbd, 0x66, 0x03, 0x10, 0x4b, 0x8e, 0x91, 0xd7, 0x58, 0x00, 0x8d, 0x20,
+    0x5c, 0xff, 0x1e, 0x1e, 0x00, 0x00, 0x89, 0xf3, 0xd7, 0x1e, 0x1e, 0x00,
+])
+CALIBRATION_BLOCK2 = bytes([
+    0x3f, 0x25, 0x2f, 0x00, 0x2d, 0x14, 0x78, 0x9c, 0x0c, 0x66, 0xe1, 0xd9, 0x12, 0x3c, 0x0d, 0x00,
+])
+RES_HEAT_VAL = 0x2c
+RES_HEAT_RANGE = 0x16
+RANGE_SW_ERR = 0x10
+
+_STATUS_MEASURING = 0x20
+
+
+def _solve(f, target, lo, hi):
+    """Smallest x in [lo, hi] with f(x) >= target, for f non-decreasing."""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if f(mid) >= target:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+class BME680Model:
+    """BME680 as seen over I2C.
+
+    Holds the register file, serves the calibration blocks and produces
+    field data for the environment in temperature (C), pressure (hPa),
+    humidity (%RH) and gas_resistance (Ohms). ADC values are found by
+    inverting the Bosch integer compensation, so the driver reads back the
+    environment to within ADC resolution.
+
+    A forced-mode trigger completes after the conversion time implied by the
+    oversampling and heater registers. Meanwhile the status register shows
+    measuring and the field registers still hold the previous result, new
+    data flag included, as the driver's short polling loop relies on; a
+    trigger during a conversion is ignored. early_reads counts field reads
+    made while a conversion was running.
+
+    """
+
+    def __init__(self, clock, variant=constants.VARIANT_LOW, chip_id=constants.CHIP_ID):  # noqa D107
+        self.clock = clock
+        self.variant = variant
+        self.regs = bytearray(256)
+        self.regs[constants.CHIP_ID_ADDR] = chip_id
+        self.regs[constants.COEFF_ADDR1:constants.COEFF_ADDR1 + len(CALIBRATION_BLOCK1)] = CALIBRATION_BLOCK1
+        self.regs[constants.COEFF_ADDR2:constants.COEFF_ADDR2 + len(CALIBRATION_BLOCK2)] = CALIBRATION_BLOCK2
+        self.regs[constants.ADDR_RES_HEAT_VAL_ADDR] = RES_HEAT_VAL
+        self.regs[constants.ADDR_RES_HEAT_RANGE_ADDR] = RES_HEAT_RANGE
+        self.regs[constants.ADDR_RANGE_SW_ERR_ADDR] = RANGE_SW_ERR
+        # The variant id is also the last byte of the second calibration block
+        self.regs[constants.CHIP_VARIANT_ADDR] = variant
+
+        calibration = constants.CalibrationData()
+        calibration.set_from_array(list(CALIBRATION_BLOCK1 + CALIBRATION_BLOCK2))
+        calibration.set_other(RES_HEAT_RANGE, constants.twos_comp(RES_HEAT_VAL, bits=8),
+                              constants.twos_comp(RANGE_SW_ERR, bits=8))
+        self._compensation = IntegerCompensation(calibration)
+
+        self.temperature = 22.5
+        self.pressure = 1013.25
+        self.humidity = 45.0
+        self.gas_resistance = 120000.0
+        # Optional gas resistance per heater profile, overriding gas_resistance
+        self.profile_gas_resistance = {}
+
+        self._pointer = 0
+        self._done_at = None
+        self.meas_index = 0
+        self.conversions = 0
+        self.early_reads = 0
+
+    def conversion_time_us(self):
+        """Duration of a forced conversion for the current register settings."""
+        ctrl_meas = self.regs[constants.CONF_T_P_MODE_ADDR]
+        ctrl_hum = self.regs[constants.CONF_OS_H_ADDR]
+        cycles = constants.OS_TO_MEAS_CYCLES[min((ctrl_meas & constants.OST_MSK) >> constants.OST_POS, 5)]
+        cycles += constants.OS_TO_MEAS_CYCLES[min((ctrl_meas & constants.OSP_MSK) >> constants.OSP_POS, 5)]
+        cycles += constants.OS_TO_MEAS_CYCLES[min(ctrl_hum & constants.OSH_MSK, 5)]
+        duration = cycles * 1963 + 477 * 4 + 477 * 5 + 1000
+        if self._run_gas():
+            duration += self._gas_wait_ms(self._nb_conv()) * 1000
+        return duration
+
+    def _run_gas(self):
+        return (self.regs[constants.CONF_ODR_RUN_GAS_NBC_ADDR] & constants.RUN_GAS_MSK) != 0
+
+    def _nb_conv(self):
+        return self.regs[constants.CONF_ODR_RUN_GAS_NBC_ADDR] & constants.NBCONV_MSK
+
+    def _gas_wait_ms(self, profile):
+        value = self.regs[constants.GAS_WAIT0_ADDR + profile]
+        return (value & 0x3f) * (1 << (2 * (value >> 6)))
+
+    def _update(self):
+        if self._done_at is not None and self.clock.now_us() >= self._done_at:
+            self._done_at = None
+            self._complete()
+
+    def _complete(self):
+        self.conversions += 1
+        self.meas_index = (self.meas_index + 1) & 0xff
+        profile = self._nb_conv()
+        field = bytearray(constants.FIELD_LENGTH)
+        field[0] = constants.NEW_DATA_MSK | profile
+        field[1] = self.meas_index
+
+        comp = self._compensation
+        adc_temp = _solve(comp.temperature, int(round(self.temperature * 100)), 0, (1 << 20) - 1)
+        comp.temperature(adc_temp)
+        # Pressure falls as its ADC value rises
+        adc_pres = _solve(lambda adc: -comp.pressure(adc), -int(round(self.pressure * 100)), 0, (1 << 20) - 1)
+        adc_hum = _solve(comp.humidity, int(round(self.humidity * 1000)), 0, (1 << 16) - 1)
+
+        field[2:5] = bytes([adc_pres >> 12, (adc_pres >> 4) & 0xff, (adc_pres & 0x0f) << 4])
+        field[5:8] = bytes([adc_temp >> 12, (adc_temp >> 4) & 0xff, (adc_temp & 0x0f) << 4])
+        field[8:10] = bytes([adc_hum >> 8, adc_hum & 0xff])
+
+        if self._run_gas():
+            resistance = self.profile_gas_resistance.get(profile, self.gas_resistance)
+            adc_gas, gas_range = self._gas_adc(resistance)
+            flags = constants.GASM_VALID_MSK
+            if self.regs[constants.RES_HEAT0_ADDR + profile] and self._gas_wait_ms(profile) >= 20:
+                flags |= constants.HEAT_STAB_MSK
+            gas = bytes([adc_gas >> 2, ((adc_gas & 0x03) << 6) | flags | gas_range])
+            if self.variant == constants.VARIANT_HIGH:
+                field[15:17] = gas
+            else:
+                field[13:15] = gas
+
+        self.regs[constants.FIELD0_ADDR:constants.FIELD0_ADDR + constants.FIELD_LENGTH] = field
+        # Forced mode drops back to sleep once the conversion is done
+        self.regs[constants.CONF_T_P_MODE_ADDR] &= ~constants.MODE_MSK & 0xff
+
+    def _gas_adc(self, resistance):
+        """Pick the gas range and ADC value that encode a resistance best."""
+        best = None
+        for gas_range in range(16):
+            if self.variant == constants.VARIANT_HIGH:
+                def decode(adc):
+                    divisor = 4096 + 3 * (adc - 512)
+                    if divisor <= 0:
+                        return float('-inf')
+                    return -(10000 * (262144 >> gas_range)) / divisor * 100
+            else:
+                floor = ((16777216 - ((self._compensation.gas_range_sw * constants.lookupTable1[gas_range]) >> 16))
+                         >> 15) + 1
+
+                def decode(adc):
+                    # Below floor the divisor goes non-positive and the result wraps
+                    if adc < floor:
+                        return float('-inf')
+                    return -self._compensation.gas_resistance_low(adc, gas_range)
+            adc = min(_solve(decode, -resistance, 0, 1023), 1023)
+            error = abs(-decode(adc) - resistance)
+            if best is None or error < best[0]:
+                best = (error, adc, gas_range)
+        return best[1], best[2]
+
+    def _write_reg(self, register, value):
+        if register == constants.SOFT_RESET_ADDR:
+            if value == constants.SOFT_RESET_CMD:
+                self.regs[constants.ADDR_SENS_CONF_START:constants.CONF_T_P_MODE_ADDR + 2] = \
+                    bytes(constants.CONF_REGS_LEN)
+                self._done_at = None
+            return
+        self.regs[register] = value
+        if register == constants.CONF_T_P_MODE_ADDR and (value & constants.MODE_MSK) == constants.FORCED_MODE \
+                and self._done_at is None:
+            self.regs[constants.FIELD0_ADDR] |= _STATUS_MEASURING
+            self._done_at = self.clock.now_us() + self.conversion_time_us()
+
+    def read(self, register, length):
+        """Burst read; register None continues from the last address."""
+        self._update()
+        if register is None:
+            register = self._pointer
+        if register == constants.FIELD0_ADDR and self._done_at is not None:
+            self.early_reads += 1
+        self._pointer = (register + length) & 0xff
+        return bytes(self.regs[register:register + length])
+
+    def write(self, register, data):
+        """Register write with auto-increment, as done by writeto_mem."""
+        self._update()
+        for offset, value in enumerate(data):
+            self._write_reg(register + offset, value)
+
+    def writeto(self, data):
+        """Plain write: (register, value) pairs, or a lone register address pointer."""
+        self._update()
+        if len(data) == 1:
+            self._pointer = data[0]
+            return
+        for i in range(0, len(data) - 1, 2):
+            self._write_reg(data[i], data[i + 1])
@@ -0,0 +1,192 @@
+"""Emulated board: pins, I2C and SPI buses, attached devices and traffic accounting."""
+from .clock import Clock
+
+_current = None
+
+
+def current():
+    """Get the board the machine/utime shims talk to."""
+    if _current is None:
+        raise RuntimeError('No emulated board installed, call emulator.install() first')
+    return _current
+
+
+def set_current(board):
+    global _current
+    _current = board
+
+
+class PinState:
+    """One GPIO, shared by every machine.Pin created for the same id."""
+
+    def __init__(self, pin_id):  # noqa D107
+        self.id = pin_id
+        self.level = 0
+        # Devices driving an input supply a function returning its level
+        self.source = None
+        self.listeners = []
+        self.irq_handler = None
+        self.irq_trigger = 0
+
+    def read(self):
+        if self.source is not None:
+            return self.source()
+        return self.level
+
+    def write(self, level):
+        level = 1 if level else 0
+        if level != self.level:
+            self.level = level
+            for listener in self.listeners:
+                listener(level)
+
+
+class I2CBus:
+    """Devices on one I2C bus, keyed by address, with per-bus traffic counters.
+
+    Each transfer advances the clock by its time on the wire, so a loop that
+    only talks to the bus still moves virtual time forward.
+
+    """
+
+    def __init__(self, bus_id, clock):  # noqa D107
+        self.id = bus_id
+        self.clock = clock
+        self.devices = {}
+        self.reset_stats()
+
+    def attach(self, address, device):
+        self.devices[address] = device
+        return device
+
+    def device(self, address):
+        try:
+            return self.devices[address]
+        except KeyError:
+            raise OSError(19, 'ENODEV')
+
+    def count(self, read=0, written=0, freq=400000):
+        self.transactions += 1
+        self.bytes_read += read
+        self.bytes_written += written
+        # Address byte plus payload, 9 clocks per byte, and a repeated start for reads
+        frames = 1 + read + written + (1 if read and written else 0)
+        self.clock.advance(frames * 9 * 1000000 // freq)
+
+    def reset_stats(self):
+        self.transactions = 0
+        self.bytes_read = 0
+        self.bytes_written = 0
+
+    def stats(self):
+        return {
+            'transactions': self.transactions,
+            'bytes_read': self.bytes_read,
+            'bytes_written': self.bytes_written,
+        }
+
+
+class SPIBus:
+    """Devices on one SPI bus, selected by their chip-select pin.
+
+    A transaction is one CS-low window; writes is the number of
+    SPI.write calls, which is what costs Python time on the device.
+    Writes advance the clock by their time on the wire.
+
+    """
+
+    def __init__(self, board, bus_id):  # noqa D107
+        self.board = board
+        self.id = bus_id
+        self.devices = []
+        self.reset_stats()
+
+    def attach(self, device, cs, dc):
+        cs_pin = self.board.pin(cs)
+        self.devices.append((device, cs_pin, self.board.pin(dc)))
+
+        def on_cs(level):
+            if level == 0:
+                self.transactions += 1
+            device.select(level == 0)
+        cs_pin.listeners.append(on_cs)
+        cs_pin.level = 1
+        return device
+
+    def write(self, buf, baudrate=1000000):
+        self.writes += 1
+        self.bytes += len(buf)
+        self.board.clock.advance(len(buf) * 8 * 1000000 // baudrate)
+        for device, cs_pin, dc_pin in self.devices:
+            if cs_pin.level == 0:
+                device.spi_write(bytes(buf), dc_pin.level)
+
+    def reset_stats(self):
+        self.transactions = 0
+        self.writes = 0
+        self.bytes = 0
+
+    def stats(self):
+        return {
+            'transactions': self.transactions,
+            'writes': self.writes,
+            'bytes': self.bytes,
+        }
+
+
+class Board:
+    """A set of pins and buses sharing one clock."""
+
+    def __init__(self, clock=None):  # noqa D107
+        self.clock = clock if clock is not None else Clock()
+        self.pins = {}
+        self.i2c_buses = {}
+        self.spi_buses = {}
+
+    def pin(self, pin_id):
+        state = self.pins.get(pin_id)
+        if state is None:
+            state = self.pins[pin_id] = PinState(pin_id)
+        return state
+
+    def i2c(self, bus_id):
+        bus = self.i2c_buses.get(bus_id)
+        if bus is None:
+            bus = self.i2c_buses[bus_id] = I2CBus(bus_id, self.clock)
+        return bus
+
+    def spi(self, bus_id):
+        bus = self.spi_buses.get(bus_id)
+        if bus is None:
+            bus = self.spi_buses[bus_id] = SPIBus(self, bus_id)
+        return bus
+
+    def reset_stats(self):
+        for bus in self.i2c_buses.values():
+            bus.reset_stats()
+        for bus in self.spi_buses.values():
+            bus.reset_stats()
+        self.clock.reset_stats()
+
+    def stats(self):
+        """Traffic and time accounting since the last reset_stats."""
+        return {
+            'i2c': dict((bus_id, bus.stats()) for bus_id, bus in self.i2c_buses.items()),
+            'spi': dict((bus_id, bus.stats()) for bus_id, bus in self.spi_buses.items()),
+            'time_us': self.clock.now_us(),
+            'slept_us': self.clock.slept_us,
+        }
+
+    @classmethod
+    def pico_room_monitor(cls, clock=None, bme680_address=0x77):
+        """The wiring of this project: BME680 on I2C1, 2.9" SSD1680 panel on SPI1."""
+        from .bme680_model import BME680Model
+        from .epd_model import SSD1680Model
+
+        board = cls(clock)
+        board.bme680 = board.i2c(1).attach(bme680_address, BME680Model(board.clock))
+        board.epd = SSD1680Model(board.clock)
+        board.spi(1).attach(board.epd, cs=9, dc=8)
+        board.pin(13).source = board.epd.busy
+        board.pin(12).listeners.append(board.epd.reset_line)
+        return board
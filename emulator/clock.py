@@ -0,0 +1,64 @@
+"""Time source shared by the emulated board, its devices and the utime shim."""
+import time
+
+
+class Clock:
+    """Microsecond clock.
+
+    A virtual clock only moves when something sleeps (or advance() is called),
+    so a benchmark that waits on a 2 s panel refresh finishes instantly while
+    still accounting for the 2 s. A real clock follows the host's monotonic
+    time, which is what asyncio-based code needs since the event loop sleeps
+    on its own.
+
+    Wall-clock time starts at epoch, by default 2021-01-01 where the Pico's
+    RTC starts after a reset.
+
+    """
+
+    def __init__(self, virtual=True, epoch=1609459200):  # noqa D107
+        self.virtual = virtual
+        self.epoch = epoch
+        self._now_us = 0
+        self._origin = time.perf_counter()
+        # Total time spent in sleep calls, in microseconds
+        self.slept_us = 0
+        self.sleeps = 0
+
+    def now_us(self):
+        """Get the current time in microseconds."""
+        if self.virtual:
+            return self._now_us
+        return int((time.perf_counter() - self._origin) * 1000000)
+
+    def now_ms(self):
+        """Get the current time in milliseconds."""
+        return self.now_us() // 1000
+
+    def time(self):
+        """Get the wall-clock time in seconds."""
+        return self.epoch + self.now_us() / 1000000.0
+
+    def advance(self, us):
+        """Move a virtual clock forward."""
+        if self.virtual:
+            self._now_us += int(us)
+
+    def sleep_us(self, us):
+        """Sleep, advancing a virtual clock instead of blocking."""
+        us = max(0, int(us))
+        self.slept_us += us
+        self.sleeps += 1
+        if self.virtual:
+            self._now_us += us
+        else:
+            time.sleep(us / 1000000)
+
+    def sleep(self, seconds):
+        """Sleep for a number of seconds."""
+        self.sleep_us(seconds * 1000000)
+
+    def reset_stats(self):
+        """Clear the sleep accounting."""
+        self.slept_us = 0
+        self.sleeps = 0
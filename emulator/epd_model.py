@@ -0,0 +1,187 @@
+"""Command-level SSD1680 model for the 2.9" 128x296 e-paper panel."""
+
+WIDTH = 128
+HEIGHT = 296
+# The controller has 176 source outputs; the panel uses the first 128
+RAM_WIDTH = 176
+
+# BUSY time per DISPLAY_UPDATE_CONTROL_2 sequence, in microseconds. Roughly
+# what a 2.9" panel takes at room temperature; override per instance.
+UPDATE_BUSY_US = {
+    0xF7: 2000000,  # full refresh
+    0xC7: 2200000,  # 4-gray refresh
+    0x0F: 400000,   # partial refresh
+    0xC0: 5000,     # load partial waveform, no refresh
+}
+DEFAULT_UPDATE_BUSY_US = 2000000
+SWRESET_BUSY_US = 10000
+HW_RESET_BUSY_US = 1000
+
+# Sequences that drive the panel rather than just load settings
+_DISPLAY_MODE_BIT = 0x04
+
+
+class SSD1680Model:
+    """SSD1680 as seen over 4-wire SPI.
+
+    Bytes sent with DC low are commands, bytes with DC high are data for the
+    last command, which carries over CS windows as on the real controller.
+    RAM writes (0x24 black/white, 0x26 red/old) follow the window (0x44/0x45),
+    cursor (0x4E/0x4F) and data entry mode (0x11). Master activation (0x20)
+    holds BUSY high for the time of the selected update sequence and, for
+    display sequences, copies the panel's columns of 0x24 RAM to panel.
+
+    """
+
+    def __init__(self, clock):  # noqa D107
+        self.clock = clock
+        self.update_busy_us = dict(UPDATE_BUSY_US)
+        self.line = RAM_WIDTH // 8
+        self.ram = {0x24: bytearray(self.line * HEIGHT), 0x26: bytearray(self.line * HEIGHT)}
+        self.panel = bytearray(WIDTH // 8 * HEIGHT)
+        self.lut = bytes()
+        self._reset_registers()
+        self._busy_until = 0
+        self.in_reset = False
+        self.selected = False
+        self.reset_stats()
+
+    def _reset_registers(self):
+        self.command = None
+        self.args = bytearray()
+        self.data_entry = 0x03
+        self.window = (0, WIDTH // 8 - 1, 0, HEIGHT - 1)
+        self.x = 0
+        self.y = 0
+        self.update_control = 0xFF
+        self.asleep = False
+
+    def reset_stats(self):
+        """Clear the command, RAM, refresh and busy counters."""
+        self.commands = {}
+        self.ram_bytes = 0
+        self.refreshes = {}
+        self.busy_us = 0
+        # (time_us, sequence) of every master activation
+        self.updates = []
+
+    def stats(self):
+        return {
+            'commands': sum(self.commands.values()),
+            'ram_bytes': self.ram_bytes,
+            'refreshes': dict(self.refreshes),
+            'busy_us': self.busy_us,
+        }
+
+    def busy(self):
+        """Level of the BUSY pin: 1 while an operation is running."""
+        return 1 if self.clock.now_us() < self._busy_until else 0
+
+    def _hold_busy(self, us):
+        self._busy_until = self.clock.now_us() + us
+        self.busy_us += us
+
+    def reset_line(self, level):
+        """Follow the RST pin; the controller restarts on the rising edge."""
+        if not level:
+            self.in_reset = True
+        elif self.in_reset:
+            self.in_reset = False
+            self._reset_registers()
+            self._hold_busy(HW_RESET_BUSY_US)
+
+    def select(self, active):
+        self.selected = active
+
+    def spi_write(self, buf, dc):
+        if self.in_reset:
+            return
+        if not dc:
+            for command in buf:
+                self._command(command)
+            return
+        if self.command in self.ram:
+            self._write_ram(self.ram[self.command], buf)
+        elif self.command is not None:
+            self.args.extend(buf)
+            self._apply()
+
+    def _command(self, command):
+        if self.asleep:
+            # Only a hardware reset wakes the controller from deep sleep
+            return
+        self.commands[command] = self.commands.get(command, 0) + 1
+        self.command = command
+        self.args = bytearray()
+        if command == 0x12:
+            self._reset_registers()
+            self._hold_busy(SWRESET_BUSY_US)
+        elif command == 0x20:
+            self._activate()
+
+    def _apply(self):
+        command = self.command
+        args = self.args
+        if command == 0x11 and len(args) >= 1:
+            self.data_entry = args[0] & 0x07
+        elif command == 0x44 and len(args) >= 2:
+            self.window = (args[0] & 0x3f, args[1] & 0x3f, self.window[2], self.window[3])
+        elif command == 0x45 and len(args) >= 4:
+            self.window = (self.window[0], self.window[1],
+                           (args[0] | args[1] << 8) & 0x1ff, (args[2] | args[3] << 8) & 0x1ff)
+        elif command == 0x4E and len(args) >= 1:
+            self.x = args[0] & 0x3f
+        elif command == 0x4F and len(args) >= 2:
+            self.y = (args[0] | args[1] << 8) & 0x1ff
+        elif command == 0x22 and len(args) >= 1:
+            self.update_control = args[0]
+        elif command == 0x32:
+            self.lut = bytes(args)
+        elif command == 0x10 and len(args) >= 1:
+            self.asleep = (args[0] & 0x03) != 0
+
+    def _write_ram(self, ram, buf):
+        x_start, x_end, y_start, y_end = self.window
+        x_step = 1 if self.data_entry & 0x01 else -1
+        y_step = 1 if self.data_entry & 0x02 else -1
+        y_first = self.data_entry & 0x04
+        x, y = self.x, self.y
+        line = self.line
+        for value in buf:
+            if x < line and y < HEIGHT:
+                ram[y * line + x] = value
+            if y_first:
+                y, x = self._step(y, y_step, y_start, y_end, x, x_step, x_start, x_end)
+            else:
+                x, y = self._step(x, x_step, x_start, x_end, y, y_step, y_start, y_end)
+        self.x, self.y = x, y
+        self.ram_bytes += len(buf)
+
+    @staticmethod
+    def _step(a, a_step, a_start, a_end, b, b_step, b_start, b_end):
+        # Advance the inner counter, wrapping into the outer one at the window edge
+        a_first, a_last = (a_start, a_end) if a_step > 0 else (a_end, a_start)
+        if a == a_last:
+            a = a_first
+            b_first, b_last = (b_start, b_end) if b_step > 0 else (b_end, b_start)
+            b = b_first if b == b_last else b + b_step
+        else:
+            a += a_step
+        return a, b
+
+    def plane(self, command, x=0):
+        """Get a panel-sized image of RAM 0x24 or 0x26, starting at byte column x."""
+        ram = self.ram[command]
+        width = WIDTH // 8
+        image = bytearray(width * HEIGHT)
+        for y in range(HEIGHT):
+            image[y * width:(y + 1) * width] = ram[y * self.line + x:y * self.line + x + width]
+        return image
+
+    def _activate(self):
+        sequence = self.update_control
+        self.updates.append((self.clock.now_us(), sequence))
+        if sequence & _DISPLAY_MODE_BIT:
+            self.refreshes[sequence] = self.refreshes.get(sequence, 0) + 1
+            self.panel[:] = self.plane(0x24)
+        self._hold_busy(self.update_busy_us.get(sequence, DEFAULT_UPDATE_BUSY_US))
@@ -0,0 +1,175 @@
+"""Host stand-in for MicroPython's framebuf module.
+
+Pixel layouts match the firmware, so buffers drawn here are byte-for-byte
+what the panel would receive. text() draws placeholder 8x8 glyphs, not the
+firmware font: every character gets a distinct, stable pattern (space is
+blank), which is enough to exercise dirty-region and refresh logic.
+
+"""
+
+MONO_VLSB = 0
+MONO_HLSB = 3
+MONO_HMSB = 4
+RGB565 = 1
+GS2_HMSB = 5
+GS4_HMSB = 2
+GS8 = 6
+MVLSB = MONO_VLSB
+
+
+def _glyph(char):
+    # Eight rows of eight bits, spread from the character code
+    code = ord(char)
+    if code == 32:
+        return bytes(8)
+    seed = (code * 2654435761) & 0xffffffff
+    rows = bytearray(8)
+    for i in range(8):
+        seed = (seed * 1103515245 + 12345) & 0xffffffff
+        rows[i] = (seed >> 16) & 0x7e
+    return bytes(rows)
+
+
+class FrameBuffer:
+    def __init__(self, buf, width, height, format, stride=None):
+        self.buf = buf
+        self.width = width
+        self.height = height
+        self.format = format
+        if stride is None:
+            stride = width
+        if format in (MONO_HLSB, MONO_HMSB):
+            stride = (stride + 7) & ~7
+        elif format == GS2_HMSB:
+            stride = (stride + 3) & ~3
+        elif format == GS4_HMSB:
+            stride = (stride + 1) & ~1
+        self.stride = stride
+
+    def _get(self, x, y):
+        buf = self.buf
+        fmt = self.format
+        if fmt == MONO_HLSB:
+            return (buf[(y * self.stride + x) >> 3] >> (7 - (x & 7))) & 1
+        if fmt == MONO_HMSB:
+            return (buf[(y * self.stride + x) >> 3] >> (x & 7)) & 1
+        if fmt == MONO_VLSB:
+            return (buf[(y >> 3) * self.stride + x] >> (y & 7)) & 1
+        if fmt == GS2_HMSB:
+            return (buf[(y * self.stride + x) >> 2] >> ((x & 3) << 1)) & 3
+        if fmt == GS4_HMSB:
+            value = buf[(y * self.stride + x) >> 1]
+            return value & 0x0f if x & 1 else value >> 4
+        if fmt == GS8:
+            return buf[y * self.stride + x]
+        index = (y * self.stride + x) * 2
+        return buf[index] | (buf[index + 1] << 8)
+
+    def _set(self, x, y, c):
+        buf = self.buf
+        fmt = self.format
+        if fmt in (MONO_HLSB, MONO_HMSB):
+            index = (y * self.stride + x) >> 3
+            bit = 7 - (x & 7) if fmt == MONO_HLSB else x & 7
+            buf[index] = (buf[index] & ~(1 << bit)) | ((c & 1) << bit)
+        elif fmt == MONO_VLSB:
+            index = (y >> 3) * self.stride + x
+            bit = y & 7
+            buf[index] = (buf[index] & ~(1 << bit)) | ((c & 1) << bit)
+        elif fmt == GS2_HMSB:
+            index = (y * self.stride + x) >> 2
+            shift = (x & 3) << 1
+            buf[index] = (buf[index] & ~(3 << shift)) | ((c & 3) << shift)
+        elif fmt == GS4_HMSB:
+            index = (y * self.stride + x) >> 1
+            if x & 1:
+                buf[index] = (buf[index] & 0xf0) | (c & 0x0f)
+            else:
+                buf[index] = (buf[index] & 0x0f) | ((c & 0x0f) << 4)
+        elif fmt == GS8:
+            buf[y * self.stride + x] = c & 0xff
+        else:
+            index = (y * self.stride + x) * 2
+            buf[index] = c & 0xff
+            buf[index + 1] = (c >> 8) & 0xff
+
+    def pixel(self, x, y, c=None):
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return None
+        if c is None:
+            return self._get(x, y)
+        self._set(x, y, c)
+
+    def fill_rect(self, x, y, w, h, c):
+        x0 = max(x, 0)
+        y0 = max(y, 0)
+        x1 = min(x + w, self.width)
+        y1 = min(y + h, self.height)
+        for yy in range(y0, y1):
+            for xx in range(x0, x1):
+                self._set(xx, yy, c)
+
+    def fill(self, c):
+        self.fill_rect(0, 0, self.width, self.height, c)
+
+    def hline(self, x, y, w, c):
+        self.fill_rect(x, y, w, 1, c)
+
+    def vline(self, x, y, h, c):
+        self.fill_rect(x, y, 1, h, c)
+
+    def rect(self, x, y, w, h, c, f=False):
+        if f:
+            self.fill_rect(x, y, w, h, c)
+            return
+        self.fill_rect(x, y, w, 1, c)
+        self.fill_rect(x, y + h - 1, w, 1, c)
+        self.fill_rect(x, y, 1, h, c)
+        self.fill_rect(x + w - 1, y, 1, h, c)
+
+    def line(self, x1, y1, x2, y2, c):
+        dx = abs(x2 - x1)
+        dy = -abs(y2 - y1)
+        sx = 1 if x1 < x2 else -1
+        sy = 1 if y1 < y2 else -1
+        err = dx + dy
+        while True:
+            self.pixel(x1, y1, c)
+            if x1 == x2 and y1 == y2:
+                break
+            e2 = 2 * err
+            if e2 >= dy:
+                err += dy
+                x1 += sx
+            if e2 <= dx:
+                err += dx
+                y1 += sy
+
+    def text(self, s, x, y, c=1):
+        for char in s:
+            rows = _glyph(char)
+            for j in range(8):
+                bits = rows[j]
+                for i in range(8):
+                    if bits & (0x80 >> i):
+                        self.pixel(x + i, y + j, c)
+            x += 8
+
+    def scroll(self, xstep, ystep):
+        xs = range(self.width) if xstep <= 0 else range(self.width - 1, -1, -1)
+        ys = range(self.height) if ystep <= 0 else range(self.height - 1, -1, -1)
+        for y in ys:
+            for x in xs:
+                sx = x - xstep
+                sy = y - ystep
+                if 0 <= sx < self.width and 0 <= sy < self.height:
+                    self._set(x, y, self._get(sx, sy))
+
+    def blit(self, fbuf, x, y, key=-1, palette=None):
+        for sy in range(fbuf.height):
+            for sx in range(fbuf.width):
+                c = fbuf._get(sx, sy)
+                if palette is not None:
+                    c = palette._get(c, 0)
+                if c != key:
+                    self.pixel(x + sx, y + sy, c)
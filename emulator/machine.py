@@ -0,0 +1,99 @@
+"""Host stand-in for MicroPython's machine module, backed by the emulated board."""
+from . import board as _board
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    OPEN_DRAIN = 2
+    PULL_UP = 1
+    PULL_DOWN = 2
+    IRQ_FALLING = 4
+    IRQ_RISING = 8
+
+    def __init__(self, pin_id, mode=-1, pull=-1, value=None):
+        self._state = _board.current().pin(pin_id)
+        self.mode = mode
+        if pull == Pin.PULL_UP and self._state.source is None:
+            self._state.level = 1
+        if value is not None:
+            self._state.write(value)
+
+    def value(self, level=None):
+        if level is None:
+            return self._state.read()
+        self._state.write(level)
+
+    def on(self):
+        self._state.write(1)
+
+    def off(self):
+        self._state.write(0)
+
+    def __call__(self, level=None):
+        return self.value(level)
+
+    def irq(self, handler=None, trigger=IRQ_FALLING | IRQ_RISING):
+        # Stored only: emulated inputs change with the clock, not as events
+        self._state.irq_handler = handler
+        self._state.irq_trigger = trigger
+
+
+class I2C:
+    def __init__(self, bus_id, scl=None, sda=None, freq=400000):
+        self._bus = _board.current().i2c(bus_id)
+        self.freq = freq
+
+    def scan(self):
+        return sorted(self._bus.devices)
+
+    def readfrom_mem(self, addr, memaddr, nbytes):
+        data = self._bus.device(addr).read(memaddr, nbytes)
+        self._bus.count(read=nbytes, written=1, freq=self.freq)
+        return bytes(data)
+
+    def readfrom_mem_into(self, addr, memaddr, buf):
+        buf[:] = self._bus.device(addr).read(memaddr, len(buf))
+        self._bus.count(read=len(buf), written=1, freq=self.freq)
+
+    def writeto_mem(self, addr, memaddr, buf):
+        self._bus.device(addr).write(memaddr, bytes(buf))
+        self._bus.count(written=len(buf) + 1, freq=self.freq)
+
+    def writeto(self, addr, buf, stop=True):
+        self._bus.device(addr).writeto(bytes(buf))
+        self._bus.count(written=len(buf), freq=self.freq)
+        return len(buf)
+
+    def readfrom_into(self, addr, buf, stop=True):
+        buf[:] = self._bus.device(addr).read(None, len(buf))
+        self._bus.count(read=len(buf), freq=self.freq)
+
+
+class SPI:
+    def __init__(self, bus_id, baudrate=1000000, **kwargs):
+        self._bus = _board.current().spi(bus_id)
+        self.baudrate = baudrate
+
+    def init(self, baudrate=1000000, **kwargs):
+        self.baudrate = baudrate
+
+    def write(self, buf):
+        self._bus.write(buf, self.baudrate)
+
+
+def lightsleep(ms=None):
+    if ms is not None:
+        _board.current().clock.sleep_us(ms * 1000)
+
+
+def deepsleep(ms=None):
+    lightsleep(ms)
+
+
+def freq(hz=None):
+    return 125000000
+
+
+def unique_id():
+    return b'\xe6\x61\x41\x04\x03\x2b\x5d\x2a'
@@ -0,0 +1,51 @@
+"""Host stand-in for MicroPython's utime, driven by the emulated board clock."""
+from . import board as _board
+
+_TICKS_PERIOD = 1 << 30
+_TICKS_MAX = _TICKS_PERIOD - 1
+_TICKS_HALFPERIOD = _TICKS_PERIOD // 2
+
+
+def _clock():
+    return _board.current().clock
+
+
+def sleep(seconds):
+    _clock().sleep(seconds)
+
+
+def sleep_ms(ms):
+    _clock().sleep_us(ms * 1000)
+
+
+def sleep_us(us):
+    _clock().sleep_us(us)
+
+
+def ticks_ms():
+    return _clock().now_ms() & _TICKS_MAX
+
+
+def ticks_us():
+    return _clock().now_us() & _TICKS_MAX
+
+
+def ticks_cpu():
+    return ticks_us()
+
+
+def ticks_add(ticks, delta):
+    return (ticks + delta) & _TICKS_MAX
+
+
+def ticks_diff(ticks1, ticks2):
+    diff = (ticks1 - ticks2) & _TICKS_MAX
+    return ((diff + _TICKS_HALFPERIOD) & _TICKS_MAX) - _TICKS_HALFPERIOD
+
+
+def time():
+    return int(_clock().time())
+
+
+def time_ns():
+    return (_clock().epoch * 1000000 + _clock().now_us()) * 1000
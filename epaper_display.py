@@ -3,63 +3,141 @@ from machine import Pin, SPI, I2C
 import framebuf
 import utime
 from time import sleep
+try:
+    import asyncio
+except ImportError:
+    import uasyncio as asyncio
 
 # Define display resolution
 EPD_WIDTH = 128
 EPD_HEIGHT = 296
 
 class EpaperDisplay:
-    def __init__(self):
+    def __init__(self, full_refresh_every=10):
         self.epd = EPD_2in9()
         self.epd.init()
 
+        # Regions that are diffed independently: one per box, top to bottom
+        box_height = EPD_HEIGHT // 4
+        self.regions = [(i * box_height, (i + 1) * box_height - 1) for i in range(4)]
+
+        self.full_refresh_every = full_refresh_every  # partial refreshes between full ones, to clear ghosting
+        self.partial_count = 0
+        self.last_frame = None  # copy of the buffer last sent to the panel
+
+    def dirty_rows(self):
+        # Merge the regions whose pixels differ from the last frame into row bands
+        line = EPD_WIDTH // 8
+        buf = self.epd.buffer
+        rows = []
+        for y_start, y_end in self.regions:
+            a = y_start * line
+            b = (y_end + 1) * line
+            if buf[a:b] != self.last_frame[a:b]:
+                if rows and rows[-1][1] == y_start - 1:
+                    rows[-1] = (rows[-1][0], y_end)
+                else:
+                    rows.append((y_start, y_end))
+        return rows
+
+    def plan_refresh(self):
+        # Full refresh on the first frame and every full_refresh_every partials,
+        # otherwise the changed row bands; [] means nothing to send
+        if self.last_frame is None or self.partial_count >= self.full_refresh_every:
+            return None
+        return self.dirty_rows()
+
+    def frame_sent(self, full):
+        if self.last_frame is None:
+            self.last_frame = bytearray(len(self.epd.buffer))
+        self.last_frame[:] = self.epd.buffer
+        self.partial_count = 0 if full else self.partial_count + 1
+
+    def refresh(self):
+        # Send the buffer to the panel. Returns False when nothing changed and
+        # the panel was left untouched.
+        rows = self.plan_refresh()
+        if rows is None:
+            if self.last_frame is not None:
+                self.epd.init()  # leave partial mode and reload the full waveform
+            self.epd.display_Base(self.epd.buffer)
+        elif rows:
+            self.epd.display_Partial_Rows(self.epd.buffer, rows)
+        else:
+            return False
+        self.frame_sent(rows is None)
+        return True
+
+    async def refresh_async(self):
+        # Same as refresh, but yields to the event loop while the panel is busy
+        rows = self.plan_refresh()
+        if rows is None:
+            if self.last_frame is not None:
+                await self.epd.init_async()
+            await self.epd.display_Base_async(self.epd.buffer)
+        elif rows:
+            await self.epd.display_Partial_Rows_async(self.epd.buffer, rows)
+        else:
+            return False
+        self.frame_sent(rows is None)
+        return True
+
     def update_display(self, temperature,humi,pres,quality):
         try:
-            self.epd.image1Gray_Portrait.fill(0xff)  # Clear the display buffer
-            box_width = EPD_WIDTH
-            box_height = EPD_HEIGHT // 4
-            
-            temp = temperature if temperature == "calibrating..." else str(round(temperature, 1)) + ' C'
-            humidity = humi if humi == "calibrating..." else str(round(humi, 0)) + ' %'
-            pressure = pres if pres == "calibrating..." else str(round(pres, 1)) + ' hPa'
-            quality = quality if quality == "calibrating..." else str(quality) 
-            
-            # Draw boxes and labels
-            for i in range(4):
-                y = i * box_height
-                self.epd.image1Gray_Portrait.rect(0, y, box_width, box_height, 0)
-
-            # Add labels for each box
-            self.epd.image1Gray_Portrait.fill_rect(1, 1, 128, 25, 0)
-            self.epd.image1Gray_Portrait.text("TEMPERATURE", 10, 10, 1)
-
-            self.epd.image1Gray_Portrait.fill_rect(1, box_height, 128, 25, 0)
-            self.epd.image1Gray_Portrait.text("HUMIDITY", 10, box_height + 10, 1)
-
-            self.epd.image1Gray_Portrait.fill_rect(1, 2 * box_height, 128, 25, 0)
-            self.epd.image1Gray_Portrait.text("PRESSURE", 10, 2 * box_height + 10, 1)
-
-            self.epd.image1Gray_Portrait.fill_rect(1, 3 * box_height, 128, 25, 0)
-            self.epd.image1Gray_Portrait.text("AQI", 10, 3 * box_height + 10, 1)
-
-            # Display the values in the corresponding boxes
-            self.epd.image1Gray_Portrait.text(temp, 10, 40, 0)
-            self.epd.image1Gray_Portrait.text(humidity, 10, box_height + 40, 0)
-            self.epd.image1Gray_Portrait.text(pressure, 10, 2 * box_height + 40, 0)
-            self.epd.image1Gray_Portrait.text(quality, 10, 3 * box_height + 34, 0)
-
-            # Add footer
-            self.epd.image1Gray_Portrait.fill_rect(1, EPD_HEIGHT - 22, 128, 22, 0)
-            self.epd.image1Gray_Portrait.text("BME680 x PICO", 10, EPD_HEIGHT - 15, 1)
-
-            # Update the display
-            self.epd.display_Base(self.epd.buffer)
-            
+            self.render(temperature, humi, pres, quality)
+            self.refresh()
+        except Exception as e:
+            error_message = f"PICO Down - Display error: {str(e)}"
+            print(error_message)
+
+    async def update_display_async(self, temperature,humi,pres,quality):
+        try:
+            self.render(temperature, humi, pres, quality)
+            await self.refresh_async()
         except Exception as e:
             error_message = f"PICO Down - Display error: {str(e)}"
             print(error_message)
-  
-WF_PARTIAL_2IN9 = [
+
+    def render(self, temperature,humi,pres,quality):
+        self.epd.image1Gray_Portrait.fill(0xff)  # Clear the display buffer
+        box_width = EPD_WIDTH
+        box_height = EPD_HEIGHT // 4
+        
+        temp = temperature if temperature == "calibrating..." else str(round(temperature, 1)) + ' C'
+        humidity = humi if humi == "calibrating..." else str(round(humi, 0)) + ' %'
+        pressure = pres if pres == "calibrating..." else str(round(pres, 1)) + ' hPa'
+        quality = quality if quality == "calibrating..." else str(quality) 
+        
+        # Draw boxes and labels
+        for i in range(4):
+            y = i * box_height
+            self.epd.image1Gray_Portrait.rect(0, y, box_width, box_height, 0)
+
+        # Add labels for each box
+        self.epd.image1Gray_Portrait.fill_rect(1, 1, 128, 25, 0)
+        self.epd.image1Gray_Portrait.text("TEMPERATURE", 10, 10, 1)
+
+        self.epd.image1Gray_Portrait.fill_rect(1, box_height, 128, 25, 0)
+        self.epd.image1Gray_Portrait.text("HUMIDITY", 10, box_height + 10, 1)
+
+        self.epd.image1Gray_Portrait.fill_rect(1, 2 * box_height, 128, 25, 0)
+        self.epd.image1Gray_Portrait.text("PRESSURE", 10, 2 * box_height + 10, 1)
+
+        self.epd.image1Gray_Portrait.fill_rect(1, 3 * box_height, 128, 25, 0)
+        self.epd.image1Gray_Portrait.text("AQI", 10, 3 * box_height + 10, 1)
+
+        # Display the values in the corresponding boxes
+        self.epd.image1Gray_Portrait.text(temp, 10, 40, 0)
+        self.epd.image1Gray_Portrait.text(humidity, 10, box_height + 40, 0)
+        self.epd.image1Gray_Portrait.text(pressure, 10, 2 * box_height + 40, 0)
+        self.epd.image1Gray_Portrait.text(quality, 10, 3 * box_height + 34, 0)
+
+        # Add footer
+        self.epd.image1Gray_Portrait.fill_rect(1, EPD_HEIGHT - 22, 128, 22, 0)
+        self.epd.image1Gray_Portrait.text("BME680 x PICO", 10, EPD_HEIGHT - 15, 1)
+
+
+WF_PARTIAL_2IN9 = bytes([
     0x0,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x80,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x40,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
@@ -79,9 +157,9 @@ WF_PARTIAL_2IN9 = [
     0x0,0x0,0x0,0x0,0x0,0x0,0x0,
     0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,
     0x22,0x17,0x41,0xB0,0x32,0x36,
-]
+])
 
-WF_PARTIAL_2IN9_Wait = [
+WF_PARTIAL_2IN9_Wait = bytes([
 0x0,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
 0x80,0x80,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
 0x40,0x40,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,0x0,
@@ -101,9 +179,9 @@ WF_PARTIAL_2IN9_Wait = [
 0x0,0x0,0x0,0x0,0x0,0x0,0x0,
 0x22,0x22,0x22,0x22,0x22,0x22,0x0,0x0,0x0,
 0x22,0x17,0x41,0xB0,0x32,0x36,
-]
+])
 
-WS_20_30 = [									
+WS_20_30 = bytes([									
 0x80,0x66,0x0,0x0,0x0,0x0,0x0,0x0,0x40,0x0,0x0,0x0,
 0x10,0x66,0x0,0x0,0x0,0x0,0x0,0x0,0x20,0x0,0x0,0x0,
 0x80,0x66,0x0,0x0,0x0,0x0,0x0,0x0,0x40,0x0,0x0,0x0,
@@ -123,9 +201,9 @@ WS_20_30 = [
 0x0,0x0,0x0,0x0,0x0,0x0,0x0,
 0x44,0x44,0x44,0x44,0x44,0x44,0x0,0x0,0x0,
 0x22,0x17,0x41,0x0,0x32,0x36
-]
+])
 
-Gray4 = [										
+Gray4 = bytes([										
 0x00,0x60,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
 0x20,0x60,0x10,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
 0x28,0x60,0x14,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,0x00,
@@ -145,7 +223,42 @@ Gray4 = [
 0x00,0x00,0x00,0x00,0x00,0x00,0x00,
 0x24,0x22,0x22,0x22,0x23,0x32,0x00,0x00,0x00,
 0x22,0x17,0x41,0xAE,0x32,0x28		
-]	
+])	
+
+# Precompiled command payloads, replayed through EPD_2in9.send
+DRIVER_OUTPUT_CONTROL = b'\x27\x01\x00'
+DATA_ENTRY_MODE = b'\x03'
+DISPLAY_UPDATE_CONTROL = b'\x00\x80'
+BORDER_WAVEFORM_4GRAY = b'\x04'
+BORDER_WAVEFORM_PARTIAL = b'\x80'
+PARTIAL_OTP_OPTIONS = b'\x00\x00\x00\x00\x00\x40\x00\x00\x00\x00'
+UPDATE_FULL = b'\xF7'
+UPDATE_PARTIAL = b'\x0F'
+UPDATE_4GRAY = b'\xC7'
+UPDATE_LOAD_PARTIAL = b'\xC0'
+DEEP_SLEEP = b'\x01'
+
+
+def gray4_lut(black_bits, shift):
+    # Map one GS2_HMSB byte (4 pixels, first pixel in the low bits) to a nibble of one
+    # plane: a pixel's bit is set when its 2-bit level is in black_bits. shift=4 builds
+    # the table for the first byte of a pair, shift=0 for the second
+    lut = bytearray(256)
+    for byte in range(256):
+        nibble = 0
+        for k in range(4):
+            nibble <<= 1
+            if (byte >> (2 * k)) & 0x03 in black_bits:
+                nibble |= 1
+        lut[byte] = nibble << shift
+    return bytes(lut)
+
+# Levels: 0x00 black, 0x01 gray2, 0x02 gray1, 0x03 white
+# 0x24 RAM is set for black and gray2, 0x26 RAM for black and gray1
+GRAY4_LUTS = (
+    gray4_lut((0x00, 0x01), 4), gray4_lut((0x00, 0x01), 0),
+    gray4_lut((0x00, 0x02), 4), gray4_lut((0x00, 0x02), 0),
+)
 
 # e-Paper
 RST_PIN         = 12
@@ -194,6 +307,10 @@ class config():
     def spi_writebyte(self, data):
         self.spi.write(bytearray(data))
 
+    def spi_write(self, buf):
+        # buf is written as-is: no copy, so bytearray/memoryview slices stream directly
+        self.spi.write(buf)
+
     def i2c_writebyte(self, reg, value):
         wbuf = [(reg>>8)&0xff, reg&0xff, value]
         self.i2c.writeto(self.address, bytearray(wbuf))
@@ -228,6 +345,21 @@ class EPD_2in9:
         self.lut = WF_PARTIAL_2IN9
         self.lut_l = WF_PARTIAL_2IN9_Wait
 
+        # Scratch buffers and views reused by send/SetWindow/SetCursor, so command, window
+        # and cursor transactions allocate nothing. SetLut sends slices of the LUT, which
+        # costs one small memoryview object per transaction, no copy
+        self.cmd_buf = bytearray(1)
+        self.window_buf = bytearray(4)
+        self.window_x = memoryview(self.window_buf)[:2]
+        self.cursor_buf = bytearray(2)
+        self.cursor_x = memoryview(self.cursor_buf)[:1]
+        self.fill_row = bytearray(self.width // 8)  # one row of send_fill's repeated byte
+
+        self.gray_planes = None  # (0x24, 0x26) plane buffers, allocated on first display_4Gray
+
+        self.busy_poll_ms = 10
+        self.busy_flag = None  # set from the BUSY falling-edge IRQ where asyncio.ThreadSafeFlag exists
+
         self.buffer_4Gray = bytearray(self.height * self.width // 4)
         self.image4Gray = framebuf.FrameBuffer(self.buffer_4Gray, self.width, self.height, framebuf.GS2_HMSB)
         self.buffer = bytearray(self.height * self.width // 8)
@@ -243,92 +375,157 @@ class EPD_2in9:
         self.config.digital_write(self.config.reset_pin, 1)
         self.config.delay_ms(50)   
 
+    async def reset_async(self):
+        self.config.digital_write(self.config.reset_pin, 1)
+        await asyncio.sleep(0.05)
+        self.config.digital_write(self.config.reset_pin, 0)
+        await asyncio.sleep(0.002)
+        self.config.digital_write(self.config.reset_pin, 1)
+        await asyncio.sleep(0.05)
+
     def send_command(self, command):
         self.config.digital_write(self.config.dc_pin, 0)
         self.config.digital_write(self.config.cs_pin, 0)
-        self.config.spi_writebyte([command])
+        self.cmd_buf[0] = command
+        self.config.spi_write(self.cmd_buf)
         self.config.digital_write(self.config.cs_pin, 1)
 
     def send_data(self, data):
         self.config.digital_write(self.config.dc_pin, 1)
         self.config.digital_write(self.config.cs_pin, 0)
-        self.config.spi_writebyte([data])
+        self.cmd_buf[0] = data
+        self.config.spi_write(self.cmd_buf)
         self.config.digital_write(self.config.cs_pin, 1)
-        
+
+    def send(self, command, data=None):
+        # One transaction: command byte (DC low) then its payload (DC high), CS held low throughout
+        self.cmd_buf[0] = command
+        self.config.digital_write(self.config.dc_pin, 0)
+        self.config.digital_write(self.config.cs_pin, 0)
+        self.config.spi_write(self.cmd_buf)
+        if data:
+            self.config.digital_write(self.config.dc_pin, 1)
+            self.config.spi_write(data)
+        self.config.digital_write(self.config.cs_pin, 1)
+
+    def send_fill(self, value, count):
+        # Repeat one byte count times in a single CS window, a row at a time
+        row = self.fill_row
+        if row[0] != value:  # always uniform, so one byte tells the current fill
+            for i in range(len(row)):
+                row[i] = value
+        self.config.digital_write(self.config.dc_pin, 1)
+        self.config.digital_write(self.config.cs_pin, 0)
+        for i in range(count // len(row)):
+            self.config.spi_write(row)
+        if count % len(row):
+            self.config.spi_write(memoryview(row)[:count % len(row)])
+        self.config.digital_write(self.config.cs_pin, 1)
+
     def ReadBusy(self):
         # print("e-Paper busy")
         while(self.config.digital_read(self.config.busy_pin) == 1):      #  0: idle, 1: busy
             self.config.delay_ms(10) 
         # print("e-Paper busy release")  
 
+    async def ReadBusy_async(self):
+        # Yield to the event loop until BUSY drops instead of sleeping in place
+        busy_pin = self.config.busy_pin
+        if self.busy_flag is None and hasattr(asyncio, 'ThreadSafeFlag') and hasattr(busy_pin, 'irq'):
+            flag = asyncio.ThreadSafeFlag()
+            busy_pin.irq(lambda pin: flag.set(), trigger=Pin.IRQ_FALLING)
+            self.busy_flag = flag
+        while(self.config.digital_read(busy_pin) == 1):      #  0: idle, 1: busy
+            if self.busy_flag is not None:
+                await self.busy_flag.wait()
+            else:
+                await asyncio.sleep(self.busy_poll_ms / 1000.0)
+
     def TurnOnDisplay(self):
-        self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
-        self.send_data(0xF7)
-        self.send_command(0x20) # MASTER_ACTIVATION
+        self.activate(UPDATE_FULL)
         self.ReadBusy()
 
     def TurnOnDisplay_Partial(self):
-        self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
-        self.send_data(0x0F)
-        self.send_command(0x20) # MASTER_ACTIVATION
+        self.activate(UPDATE_PARTIAL)
         self.ReadBusy()
 
     def TurnOnDisplay_4Gray(self):
-        self.send_command(0x22) # DISPLAY_UPDATE_CONTROL_2
-        self.send_data(0xC7)
-        self.send_command(0x20) # MASTER_ACTIVATION
+        self.activate(UPDATE_4GRAY)
         self.ReadBusy()
 
+    async def TurnOnDisplay_async(self):
+        self.activate(UPDATE_FULL)
+        await self.ReadBusy_async()
+
+    async def TurnOnDisplay_Partial_async(self):
+        self.activate(UPDATE_PARTIAL)
+        await self.ReadBusy_async()
+
+    async def TurnOnDisplay_4Gray_async(self):
+        self.activate(UPDATE_4GRAY)
+        await self.ReadBusy_async()
+
+    def activate(self, mode):
+        # Start a display update; the caller waits on BUSY
+        self.send(0x22, mode) # DISPLAY_UPDATE_CONTROL_2
+        self.send_command(0x20) # MASTER_ACTIVATION
+
     def delay_ms(self, delaytime):
         utime.sleep(delaytime / 1000.0)
 
+    def frame(self, image):
+        # One full panel worth of bytes, without copying the caller's buffer
+        return memoryview(image)[:self.height * (self.width // 8)]
+
     def SendLut(self, isQuick):
-        self.send_command(0x32)
         if(isQuick):
             lut = self.lut    
         else:
             lut = self.lut_l
 
-        for i in range(0, 153):
-            self.send_data(lut[i])
+        self.send(0x32, memoryview(lut)[:153])
         self.ReadBusy()
 
     def SetWindow(self, x_start, y_start, x_end, y_end):
-        self.send_command(0x44) # SET_RAM_X_ADDRESS_START_END_POSITION
+        buf = self.window_buf
         # x point must be the multiple of 8 or the last 3 bits will be ignored
-        self.send_data((x_start>>3) & 0xFF)
-        self.send_data((x_end>>3) & 0xFF)
-        self.send_command(0x45) # SET_RAM_Y_ADDRESS_START_END_POSITION
-        self.send_data(y_start & 0xFF)
-        self.send_data((y_start >> 8) & 0xFF)
-        self.send_data(y_end & 0xFF)
-        self.send_data((y_end >> 8) & 0xFF)
+        buf[0] = (x_start>>3) & 0xFF
+        buf[1] = (x_end>>3) & 0xFF
+        self.send(0x44, self.window_x) # SET_RAM_X_ADDRESS_START_END_POSITION
+        buf[0] = y_start & 0xFF
+        buf[1] = (y_start >> 8) & 0xFF
+        buf[2] = y_end & 0xFF
+        buf[3] = (y_end >> 8) & 0xFF
+        self.send(0x45, buf) # SET_RAM_Y_ADDRESS_START_END_POSITION
 
     def SetCursor(self, x, y):
-        self.send_command(0x4E) # SET_RAM_X_ADDRESS_COUNTER
+        buf = self.cursor_buf
         # x point must be the multiple of 8 or the last 3 bits will be ignored
-        self.send_data((x>>3) & 0xFF)
-        
-        self.send_command(0x4F) # SET_RAM_Y_ADDRESS_COUNTER
-        self.send_data(y & 0xFF)
-        self.send_data((y >> 8) & 0xFF)
+        buf[0] = (x>>3) & 0xFF
+        self.send(0x4E, self.cursor_x) # SET_RAM_X_ADDRESS_COUNTER
+
+        buf[0] = y & 0xFF
+        buf[1] = (y >> 8) & 0xFF
+        self.send(0x4F, buf) # SET_RAM_Y_ADDRESS_COUNTER
         self.ReadBusy()
 
     def SetLut(self, lut):
-        self.send_command(0x32)
-        for i in range(0, 153):
-            self.send_data(lut[i])
+        lut = memoryview(lut)
+        self.send(0x32, lut[:153])
         self.ReadBusy()
-        self.send_command(0x3f)
-        self.send_data(lut[153])
-        self.send_command(0x03);	# gate voltage
-        self.send_data(lut[154])
-        self.send_command(0x04);	# source voltage
-        self.send_data(lut[155])	# VSH
-        self.send_data(lut[156])	# VSH2
-        self.send_data(lut[157])	# VSL
-        self.send_command(0x2c);		# VCOM
-        self.send_data(lut[158])
+        self.SetLut_voltages(lut)
+
+    async def SetLut_async(self, lut):
+        lut = memoryview(lut)
+        self.send(0x32, lut[:153])
+        await self.ReadBusy_async()
+        self.SetLut_voltages(lut)
+
+    def SetLut_voltages(self, lut):
+        self.send(0x3f, lut[153:154])
+        self.send(0x03, lut[154:155])	# gate voltage
+        self.send(0x04, lut[155:158])	# source voltage: VSH, VSH2, VSL
+        self.send(0x2c, lut[158:159])	# VCOM
 
     def init(self):
         # EPD hardware init start     
@@ -338,24 +535,31 @@ class EPD_2in9:
         self.send_command(0x12)  #SWRESET
         self.ReadBusy()   
 
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0x27)
-        self.send_data(0x01)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
+        self.init_registers()
+        self.ReadBusy()
+        # EPD hardware init end
+        return 0
+
+    async def init_async(self):
+        await self.reset_async()
+
+        await self.ReadBusy_async()
+        self.send_command(0x12)  #SWRESET
+        await self.ReadBusy_async()
+
+        self.init_registers()
+        await self.ReadBusy_async()
+        return 0
+
+    def init_registers(self):
+        self.send(0x01, DRIVER_OUTPUT_CONTROL) #Driver output control
+        self.send(0x11, DATA_ENTRY_MODE) #data entry mode
 
         self.SetWindow(0, 0, self.width-1, self.height-1)
 
-        self.send_command(0x21) #  Display update control
-        self.send_data(0x00)
-        self.send_data(0x80)	
+        self.send(0x21, DISPLAY_UPDATE_CONTROL) #  Display update control
     
         self.SetCursor(0, 0)
-        self.ReadBusy()
-        # EPD hardware init end
-        return 0
     
     def init_4Gray(self):
         self.reset()
@@ -364,18 +568,12 @@ class EPD_2in9:
         self.send_command(0x12)  #SWRESET
         self.ReadBusy() 
 
-        self.send_command(0x01) #Driver output control      
-        self.send_data(0x27)
-        self.send_data(0x01)
-        self.send_data(0x00)
-    
-        self.send_command(0x11) #data entry mode       
-        self.send_data(0x03)
+        self.send(0x01, DRIVER_OUTPUT_CONTROL) #Driver output control
+        self.send(0x11, DATA_ENTRY_MODE) #data entry mode
         
         self.SetWindow(8, 0, self.width, self.height-1)
 
-        self.send_command(0x3C)
-        self.send_data(0x04)
+        self.send(0x3C, BORDER_WAVEFORM_4GRAY)
     
         self.SetCursor(8, 0)
         self.ReadBusy()
@@ -387,138 +585,94 @@ class EPD_2in9:
     def display(self, image):
         if (image == None):
             return            
-        self.send_command(0x24) # WRITE_RAM
-        for i in range(0, self.height * int(self.width/8)):
-            # for i in range(0, int(self.width / 8)):
-            self.send_data(image[i])   
+        self.send(0x24, self.frame(image)) # WRITE_RAM
         self.TurnOnDisplay()
 
     def display_Base(self, image):
         if (image == None):
             return   
-        self.send_command(0x24) # WRITE_RAM
-        for i in range(0, self.height * int(self.width/8)):
-            self.send_data(image[i])
-        self.send_command(0x26) # WRITE_RAM
-        for i in range(0, self.height * int(self.width/8)):
-            self.send_data(image[i])
+        frame = self.frame(image)
+        self.send(0x24, frame) # WRITE_RAM
+        self.send(0x26, frame) # WRITE_RAM
         self.TurnOnDisplay()
+
+    async def display_Base_async(self, image):
+        if (image == None):
+            return
+        frame = self.frame(image)
+        self.send(0x24, frame) # WRITE_RAM
+        self.send(0x26, frame) # WRITE_RAM
+        await self.TurnOnDisplay_async()
         
     def display_Partial(self, image):
         if (image == None):
             return
-            
+        self.display_Partial_Rows(image, [(0, self.height - 1)])
+
+    def display_Partial_Rows(self, image, rows):
+        # rows: list of (y_start, y_end) bands, inclusive; each band is written to
+        # its own RAM window and the panel is refreshed once for all of them
+        if (image == None) or not rows:
+            return
+
+        self.partial_begin()
+        self.ReadBusy()
+        self.write_Rows(image, rows)
+        self.TurnOnDisplay_Partial()
+
+    async def display_Partial_Rows_async(self, image, rows):
+        if (image == None) or not rows:
+            return
+        self.partial_begin()
+        await self.ReadBusy_async()
+        self.write_Rows(image, rows)
+        await self.TurnOnDisplay_Partial_async()
+
+    def partial_begin(self):
+        # Switch to the partial waveform; the caller waits on BUSY for the LUT load
         self.config.digital_write(self.config.reset_pin, 0)
         self.config.delay_ms(0.2)
         self.config.digital_write(self.config.reset_pin, 1) 
         
         self.SendLut(1)
-        self.send_command(0x37)
-        self.send_data(0x00)
-        self.send_data(0x00)  
-        self.send_data(0x00)  
-        self.send_data(0x00) 
-        self.send_data(0x00)  	
-        self.send_data(0x40)  
-        self.send_data(0x00)  
-        self.send_data(0x00)   
-        self.send_data(0x00)  
-        self.send_data(0x00)
-
-        self.send_command(0x3C) #BorderWavefrom
-        self.send_data(0x80)
-
-        self.send_command(0x22) 
-        self.send_data(0xC0)   
-        self.send_command(0x20) 
-        self.ReadBusy()
+        self.send(0x37, PARTIAL_OTP_OPTIONS)
+        self.send(0x3C, BORDER_WAVEFORM_PARTIAL) #BorderWavefrom
 
-        self.SetWindow(0, 0, self.width - 1, self.height - 1)
-        self.SetCursor(0, 0)
-        
-        self.send_command(0x24) # WRITE_RAM
-        for i in range(0, self.height * int(self.width/8)):
-            self.send_data(image[i])
-        self.TurnOnDisplay_Partial()
+        self.activate(UPDATE_LOAD_PARTIAL)
 
+    def write_Rows(self, image, rows):
+        frame = self.frame(image)
+        line = self.width // 8
+        for y_start, y_end in rows:
+            self.SetWindow(0, y_start, self.width - 1, y_end)
+            self.SetCursor(0, y_start)
+            self.send(0x24, frame[y_start * line:(y_end + 1) * line]) # WRITE_RAM
 
-    def display_4Gray(self, image):
-        self.send_command(0x24)
-        for i in range(0, 4736):
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0x03 
-                    if(temp2 == 0x03):
-                        temp3 |= 0x00   # white
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01   # black
-                    elif(temp2 == 0x02):
-                        temp3 |= 0x00   # gray1
-                    else:   # 0x01
-                        temp3 |= 0x01   # gray2
-                    temp3 <<= 1
-
-                    temp1 >>= 2
-                    temp2 = temp1&0x03 
-                    if(temp2 == 0x03):   # white
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):   # black
-                        temp3 |= 0x01
-                    elif(temp2 == 0x02):
-                        temp3 |= 0x00   # gray1
-                    else:   # 0x01
-                        temp3 |= 0x01   # gray2
-                    
-                    if (( j!=1 ) | ( k!=1 )):
-                        temp3 <<= 1
-                    temp1 >>= 2
-            self.send_data(temp3)
-            
-        self.send_command(0x26)	       
-        for i in range(0, 4736):
-            temp3=0
-            for j in range(0, 2):
-                temp1 = image[i*2+j]
-                for k in range(0, 2):
-                    temp2 = temp1&0x03 
-                    if(temp2 == 0x03):
-                        temp3 |= 0x00   # white
-                    elif(temp2 == 0x00):
-                        temp3 |= 0x01   # black
-                    elif(temp2 == 0x02):
-                        temp3 |= 0x01   # gray1
-                    else:   # 0x01
-                        temp3 |= 0x00   # gray2
-                    temp3 <<= 1
-
-                    temp1 >>= 2
-                    temp2 = temp1&0x03
-                    if(temp2 == 0x03):   # white
-                        temp3 |= 0x00
-                    elif(temp2 == 0x00):   # black
-                        temp3 |= 0x01
-                    elif(temp2 == 0x02):
-                        temp3 |= 0x01   # gray1
-                    else:   # 0x01
-                        temp3 |= 0x00   # gray2  
-                    if(j!=1 or k!=1):                    
-                        temp3 <<= 1
-                    temp1 >>= 2
-            self.send_data(temp3)
 
+    def display_4Gray(self, image):
+        if self.gray_planes is None:
+            self.gray_planes = (bytearray(self.height * self.width // 8), bytearray(self.height * self.width // 8))
+        plane_new, plane_old = self.gray_planes
+        hi_new, lo_new, hi_old, lo_old = GRAY4_LUTS
+
+        # Each pair of GS2_HMSB bytes (4 pixels each) packs into one byte per plane
+        for i in range(len(plane_new)):
+            a = image[i * 2]
+            b = image[i * 2 + 1]
+            plane_new[i] = hi_new[a] | lo_new[b]
+            plane_old[i] = hi_old[a] | lo_old[b]
+
+        self.send(0x24, plane_new)
+        self.send(0x26, plane_old)
         self.TurnOnDisplay_4Gray()
 
     def Clear(self, color):
         self.send_command(0x24) # WRITE_RAM
-        for i in range(0, self.height * int(self.width/8)):
-            self.send_data(color)
+        self.send_fill(color, self.height * (self.width // 8))
         self.TurnOnDisplay()
 
     def sleep(self):
-        self.send_command(0x10) # DEEP_SLEEP_MODE
-        self.send_data(0x01)
+        self.send(0x10, DEEP_SLEEP) # DEEP_SLEEP_MODE
         
         self.config.delay_ms(2000)
         self.module_exit()
@@ -0,0 +1,147 @@
+import gc
+import utime
+from array import array
+
+# Hot-path methods timed by enable(): module, class, method, span name
+SPANS = (
+    ('bme680', 'BME680', 'get_sensor_data', 'sensor.get_sensor_data'),
+    ('bme680', 'BME680', 'set_power_mode', 'sensor.trigger'),
+    ('bme680', 'BME680', '_read_field_data', 'sensor.read_field'),
+    ('bme680', 'BME680', '_calc_temperature', 'sensor.compensate'),
+    ('bme680', 'BME680', '_calc_pressure', 'sensor.compensate'),
+    ('bme680', 'BME680', '_calc_humidity', 'sensor.compensate'),
+    ('bme680', 'BME680', '_calc_gas_resistance_high', 'sensor.compensate'),
+    ('bme680', 'BME680', '_calc_gas_resistance_low', 'sensor.compensate'),
+    ('bme680IAQ', 'IAQTracker', 'getIAQ', 'iaq.getIAQ'),
+    ('epaper_display', 'EpaperDisplay', 'update_display', 'display.update_display'),
+    ('epaper_display', 'EpaperDisplay', 'render', 'display.render'),
+    ('epaper_display', 'EpaperDisplay', 'refresh', 'display.refresh'),
+    ('epaper_display', 'config', 'spi_write', 'epd.spi_write'),
+    ('epaper_display', 'EPD_2in9', 'ReadBusy', 'epd.ReadBusy'),
+)
+
+# Histogram bucket b counts durations of 2**(b-1) to 2**b - 1 us (bucket 0 is 0 us); the
+# last bucket takes everything from about 8 s up
+BUCKETS = 24
+
+# Heap bytes in use, where the port reports it
+_mem_alloc = getattr(gc, 'mem_alloc', None)
+
+class Histogram:
+    # Fixed log2 buckets of span duration, plus totals and heap growth per call
+    def __init__(self, name):
+        self.name = name
+        self.buckets = array('L', [0] * BUCKETS)
+        self.clear()
+
+    def clear(self):
+        for i in range(BUCKETS):
+            self.buckets[i] = 0
+        self.count = 0
+        self.total_us = 0
+        self.max_us = 0
+        self.alloc = 0
+        self.max_alloc = 0
+
+    def add(self, us, alloc=0):
+        bucket = 0
+        d = us
+        while d and bucket < BUCKETS - 1:
+            d >>= 1
+            bucket += 1
+        self.buckets[bucket] += 1
+        self.count += 1
+        self.total_us += us
+        if us > self.max_us:
+            self.max_us = us
+        # A collection inside the span shows as negative growth; count it as none
+        if alloc > 0:
+            self.alloc += alloc
+            if alloc > self.max_alloc:
+                self.max_alloc = alloc
+
+    def percentile(self, p):
+        # Upper bound, in us, of the bucket holding the p-th percentile
+        if not self.count:
+            return 0
+        target = self.count * p / 100
+        seen = 0
+        for bucket in range(BUCKETS):
+            seen += self.buckets[bucket]
+            if seen >= target:
+                return (1 << bucket) - 1
+        return self.max_us
+
+histograms = {}
+_originals = []
+
+def histogram(name):
+    h = histograms.get(name)
+    if h is None:
+        h = histograms[name] = Histogram(name)
+    return h
+
+def wrap(name, func):
+    # func timed into the named span's histogram
+    h = histogram(name)
+    ticks_us = utime.ticks_us
+    ticks_diff = utime.ticks_diff
+    mem_alloc = _mem_alloc
+
+    if mem_alloc is None:
+        def timed(*args, **kwargs):
+            start = ticks_us()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                h.add(ticks_diff(ticks_us(), start))
+    else:
+        def timed(*args, **kwargs):
+            mem = mem_alloc()
+            start = ticks_us()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                h.add(ticks_diff(ticks_us(), start), mem_alloc() - mem)
+    return timed
+
+def enable(spans=SPANS):
+    # Wrap the listed methods in their classes, so existing instances are timed too.
+    # Off, nothing is wrapped and the hot paths run exactly as without this module
+    if _originals:
+        return
+    for module_name, class_name, method, name in spans:
+        try:
+            cls = getattr(__import__(module_name), class_name)
+            func = getattr(cls, method)
+        except (ImportError, AttributeError):
+            continue
+        _originals.append((cls, method, func))
+        setattr(cls, method, wrap(name, func))
+
+def disable():
+    # Put the original methods back; the histograms are kept
+    while _originals:
+        cls, method, func = _originals.pop()
+        setattr(cls, method, func)
+
+def enabled():
+    return bool(_originals)
+
+def clear():
+    for h in histograms.values():
+        h.clear()
+
+def dump():
+    # Print every span over serial: calls, mean/p50/p99/max us, heap growth, then the
+    # non-empty buckets as upper bound (us): count
+    print("span                       calls    mean     p50     p99     max   alloc B")
+    for name in sorted(histograms):
+        h = histograms[name]
+        if not h.count:
+            continue
+        print("%-24s %7d %7d %7d %7d %7d %9d" % (name, h.count, h.total_us // h.count, h.percentile(50),
+                                                 h.percentile(99), h.max_us, h.alloc // h.count))
+        print("    " + " ".join("%d:%d" % ((1 << b) - 1, h.buckets[b]) for b in range(BUCKETS) if h.buckets[b]))
+    if hasattr(gc, 'mem_free'):
+        print("Free memory:", gc.mem_free())
@@ -0,0 +1,27 @@
+"""Host-side reader for the binary reading logs written by datalog.FlashLog.
+
+Segments are memory-mapped and exposed as NumPy structured arrays, with no
+per-record parsing in Python:
+
+    from logreader import LogReader
+    reader = LogReader('log')
+    for batch in reader.batches(start=1700000000):
+        print(batch['time'][0], batch['aq'].mean())
+
+Each segment's sparse time index (the .idx file the device writes beside it)
+narrows range queries to the records in range; rebuild_indexes() recreates
+lost ones.
+
+Requires NumPy; it is not meant to run on the Pico.
+
+"""
+from .format import FIELDS, FLAG_CALIBRATING, FLAG_HEAT_STABLE, HEADER_DTYPE, RECORD_DTYPE, crc_valid
+from .index import INDEX_DTYPE, build_index, read_index, rebuild_indexes, write_index
+from .reader import LogReader, find_segments
+from .segment import Segment, SegmentError
+
+__all__ = (
+    'FIELDS', 'FLAG_CALIBRATING', 'FLAG_HEAT_STABLE', 'HEADER_DTYPE', 'RECORD_DTYPE', 'crc_valid',
+    'INDEX_DTYPE', 'build_index', 'read_index', 'rebuild_indexes', 'write_index',
+    'LogReader', 'find_segments', 'Segment', 'SegmentError',
+)
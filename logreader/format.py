@@ -0,0 +1,79 @@
+"""NumPy layout of the segment files written by datalog.FlashLog."""
+import numpy as np
+
+MAGIC = b'BMEL'
+VERSION = 2
+SEGMENT_SUFFIX = '.bml'
+INDEX_SUFFIX = '.idx'
+# Records between index entries, as datalog.INDEX_EVERY
+INDEX_EVERY = 32
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S4'),
+    ('version', '<u2'),
+    ('record_size', '<u2'),
+    ('segment', '<u4'),
+    ('first_time', '<u4'),
+    ('reserved', 'V16'),
+])
+
+# Fields as in bme680 FieldData plus the IAQ tracker's AQ; status holds the
+# datalog FLAG_* bits rather than the sensor's status register
+RECORD_DTYPE = np.dtype([
+    ('time', '<u4'),
+    ('sequence', '<u4'),
+    ('temperature', '<f4'),
+    ('pressure', '<f4'),
+    ('humidity', '<f4'),
+    ('gas_resistance', '<f4'),
+    ('aq', '<f4'),
+    ('status', 'u1'),
+    ('crc', 'u1'),
+    ('reserved', 'V2'),
+])
+
+HEADER_SIZE = HEADER_DTYPE.itemsize
+RECORD_SIZE = RECORD_DTYPE.itemsize
+# Bytes covered by the CRC: everything before it
+CRC_SPAN = RECORD_DTYPE.fields['crc'][1]
+
+FLAG_HEAT_STABLE = 0x01
+FLAG_CALIBRATING = 0x02
+
+# Measurement columns, for columnar batches
+FIELDS = ('time', 'temperature', 'pressure', 'humidity', 'gas_resistance', 'aq', 'status')
+
+
+# CRC start value, as datalog.CRC_INIT; not 0, so all-zero records fail
+CRC_INIT = 0xFF
+
+
+def _crc_table():
+    # CRC-8, polynomial 0x07, as in datalog
+    table = np.zeros(256, dtype=np.uint8)
+    for i in range(256):
+        crc = i
+        for _ in range(8):
+            crc = ((crc << 1) ^ 0x07) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+        table[i] = crc
+    return table
+
+
+CRC_TABLE = _crc_table()
+
+
+def crc_valid(records):
+    """Check the CRC of every record at once.
+
+    Runs the CRC byte-column by byte-column over all records, so the cost is
+    CRC_SPAN vector operations regardless of the record count.
+
+    :param records: Array of RECORD_DTYPE
+    :returns: Boolean mask, True where the stored CRC matches
+
+    """
+    raw = records.view(np.uint8).reshape(len(records), RECORD_SIZE)
+    crc = np.full(len(records), CRC_INIT, dtype=np.uint8)
+    for i in range(CRC_SPAN):
+        crc = CRC_TABLE[crc ^ raw[:, i]]
+    return crc == records['crc']
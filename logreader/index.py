@@ -0,0 +1,108 @@
+"""Sparse time indexes written beside log segments by datalog.FlashLog."""
+import numpy as np
+
+from .format import HEADER_SIZE, INDEX_EVERY, INDEX_SUFFIX, RECORD_SIZE, SEGMENT_SUFFIX, crc_valid
+
+# (time, byte offset in the segment) of every INDEX_EVERY-th record and of the last record slot
+INDEX_DTYPE = np.dtype([
+    ('time', '<u4'),
+    ('offset', '<u4'),
+])
+
+
+def index_path(segment_path):
+    """Get the index file path for a segment file."""
+    return segment_path[:-len(SEGMENT_SUFFIX)] + INDEX_SUFFIX
+
+
+def read_index(segment):
+    """Get a segment's index from its file, or None if missing or stale.
+
+    An index is stale when it does not end at the segment's last record
+    slot, as after power loss before the device wrote it.
+
+    :param segment: Segment to read the index of
+
+    """
+    try:
+        index = np.fromfile(index_path(segment.path), dtype=INDEX_DTYPE)
+    except (OSError, ValueError):
+        return None
+    end = HEADER_SIZE + len(segment) * RECORD_SIZE
+    if not len(index) or index['offset'][0] != HEADER_SIZE or index['offset'][-1] + RECORD_SIZE != end:
+        return None
+    return index
+
+
+def build_index(segment, every=INDEX_EVERY):
+    """Build a segment's index from its records, as the device does.
+
+    Entries whose record fails its CRC are left out; the last entry is the
+    last record slot with the time of the newest valid record.
+
+    :param segment: Segment to index
+    :param every: Records between entries
+
+    """
+    count = len(segment)
+    valid = np.flatnonzero(segment.valid())
+    if not len(valid):
+        return np.empty(0, dtype=INDEX_DTYPE)
+    positions = np.arange(0, count, every)
+    positions = positions[crc_valid(segment.records[positions])]
+    index = np.empty(len(positions) + 1, dtype=INDEX_DTYPE)
+    index['time'][:-1] = segment.records['time'][positions]
+    index['offset'][:-1] = HEADER_SIZE + positions * RECORD_SIZE
+    index[-1] = (segment.records['time'][valid[-1]], HEADER_SIZE + (count - 1) * RECORD_SIZE)
+    return index
+
+
+def write_index(segment, index):
+    """Write index as the segment's index file."""
+    index.astype(INDEX_DTYPE).tofile(index_path(segment.path))
+
+
+def rebuild_indexes(path, every=INDEX_EVERY, force=False):
+    """Write the index of every segment in a directory that lacks a valid one.
+
+    :param path: Segment directory
+    :param every: Records between entries
+    :param force: Rebuild valid indexes too
+    :returns: Paths of the indexes written
+
+    """
+    from .reader import find_segments
+    from .segment import Segment, SegmentError
+
+    written = []
+    for segment_path in find_segments(path):
+        try:
+            segment = Segment(segment_path)
+        except (OSError, SegmentError):
+            continue
+        if not force and read_index(segment) is not None:
+            continue
+        write_index(segment, build_index(segment, every))
+        written.append(index_path(segment_path))
+    return written
+
+
+def span(index, start=None, end=None):
+    """Get the record numbers [lo, hi) that can hold start <= time < end.
+
+    Two binary searches over the index; every record outside the span is
+    known to be out of range, so only hi - lo records need touching.
+
+    :param index: Array of INDEX_DTYPE
+    :param start: First time to include, None for no limit
+    :param end: Time to stop before, None for no limit
+
+    """
+    times = index['time']
+    records = (index['offset'].astype(np.int64) - HEADER_SIZE) // RECORD_SIZE
+    i = 0 if start is None else int(np.searchsorted(times, start, side='left'))
+    j = len(times) if end is None else int(np.searchsorted(times, end, side='left'))
+    lo = int(records[i - 1]) if i > 0 else int(records[0])
+    hi = int(records[j]) if j < len(times) else int(records[-1]) + 1
+    return lo, max(lo, hi)
+
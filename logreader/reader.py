@@ -0,0 +1,106 @@
+"""Streaming access to a directory, or list, of log segments."""
+import os
+
+import numpy as np
+
+from .format import FIELDS, RECORD_DTYPE, SEGMENT_SUFFIX, crc_valid
+from .segment import Segment
+
+
+def find_segments(path):
+    """Get the segment files in a directory, oldest first.
+
+    :param path: Directory as written by datalog.FlashLog
+
+    """
+    names = [name for name in os.listdir(path) if name.endswith(SEGMENT_SUFFIX)]
+    names = [name for name in names if name[:-len(SEGMENT_SUFFIX)].isdigit()]
+    names.sort(key=lambda name: int(name[:-len(SEGMENT_SUFFIX)]))
+    return [os.path.join(path, name) for name in names]
+
+
+class LogReader:
+    """Read one or many log segments without per-record Python work.
+
+    Segments are opened one at a time while iterating, so memory stays at one
+    memory map however many files there are. Every batch is a structured
+    array of RECORD_DTYPE: a view onto the file when nothing is dropped, a
+    copy when CRC checking removes torn records.
+
+        reader = LogReader('logs/device-7')
+        for batch in reader.batches(start=t0, end=t1):
+            print(batch['temperature'].mean())
+        columns = reader.columns(fields=('time', 'aq'))
+
+    Times are the device clock. A Pico without a time source restarts at
+    2021-01-01 on every boot, so range queries apply per segment and never
+    assume times increase across segments.
+
+    :param paths: Segment directory, or an iterable of segment paths
+    :param verify: Drop records whose CRC does not match
+
+    """
+
+    def __init__(self, paths, verify=True):  # noqa D107
+        if isinstance(paths, (str, os.PathLike)):
+            paths = find_segments(paths)
+        self.paths = list(paths)
+        self.verify = verify
+
+    def segments(self):
+        """Iterate over the segments, skipping unreadable files."""
+        for path in self.paths:
+            try:
+                segment = Segment(path)
+            except (OSError, ValueError):
+                continue
+            if len(segment):
+                yield segment
+
+    def batches(self, start=None, end=None):
+        """Iterate over per-segment record arrays with start <= time < end.
+
+        :param start: First time to include, None for no limit
+        :param end: Time to stop before, None for no limit
+
+        """
+        for segment in self.segments():
+            if start is not None and segment.last_time < start:
+                continue
+            if end is not None and segment.first_time >= end:
+                continue
+            records = segment.slice_time(start, end)
+            if self.verify and len(records):
+                valid = crc_valid(records)
+                if not valid.all():
+                    records = records[valid]
+            if len(records):
+                yield records
+
+    def __iter__(self):
+        return self.batches()
+
+    def column_batches(self, start=None, end=None, fields=FIELDS):
+        """Iterate over batches as dicts of field name to 1-D array.
+
+        :param start: First time to include, None for no limit
+        :param end: Time to stop before, None for no limit
+        :param fields: Field names to include
+
+        """
+        for records in self.batches(start, end):
+            yield dict((name, records[name]) for name in fields)
+
+    def read(self, start=None, end=None):
+        """Get all records with start <= time < end as one array (a copy)."""
+        batches = list(self.batches(start, end))
+        if not batches:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        return np.concatenate(batches)
+
+    def columns(self, start=None, end=None, fields=FIELDS):
+        """Get all records with start <= time < end as a dict of contiguous columns."""
+        batches = list(self.batches(start, end))
+        return dict((name, np.concatenate([records[name] for records in batches])
+                     if batches else np.empty(0, dtype=RECORD_DTYPE[name]))
+                    for name in fields)
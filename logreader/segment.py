@@ -0,0 +1,81 @@
+"""A single memory-mapped log segment."""
+import numpy as np
+
+from .format import HEADER_DTYPE, HEADER_SIZE, MAGIC, RECORD_DTYPE, RECORD_SIZE, VERSION, crc_valid
+from .index import build_index, read_index, span
+
+
+class SegmentError(ValueError):
+    """Raised for a file that is not a readable log segment."""
+
+
+class Segment:
+    """Log segment file exposed as a structured array.
+
+    The file is memory-mapped read-only and records is a view onto it, so
+    opening a segment reads only the header and the pages actually touched.
+    A trailing partial record, as left by power loss mid-write, is ignored.
+    Time lookups go through the segment's sparse index, built in memory
+    when the device's index file is missing or stale.
+
+    """
+
+    def __init__(self, path):  # noqa D107
+        self.path = path
+        raw = np.memmap(path, dtype=np.uint8, mode='r')
+        if len(raw) < HEADER_SIZE:
+            raise SegmentError('{}: shorter than a header'.format(path))
+        header = raw[:HEADER_SIZE].view(HEADER_DTYPE)[0]
+        if header['magic'] != MAGIC:
+            raise SegmentError('{}: bad magic {!r}'.format(path, bytes(header['magic'])))
+        if header['version'] != VERSION or header['record_size'] != RECORD_SIZE:
+            raise SegmentError('{}: unsupported version {} with {} byte records'.format(
+                path, header['version'], header['record_size']))
+        self.number = int(header['segment'])
+        self.first_time = int(header['first_time'])
+        count = (len(raw) - HEADER_SIZE) // RECORD_SIZE
+        self.records = raw[HEADER_SIZE:HEADER_SIZE + count * RECORD_SIZE].view(RECORD_DTYPE)
+        self._index = None
+
+    def __len__(self):
+        return len(self.records)
+
+    @property
+    def index(self):
+        """Get the sparse time index, an array of INDEX_DTYPE."""
+        if self._index is None:
+            index = read_index(self)
+            self._index = build_index(self) if index is None else index
+        return self._index
+
+    @property
+    def last_time(self):
+        """Get the time of the newest valid record, or first_time if there is none."""
+        return int(self.index['time'][-1]) if len(self.index) else self.first_time
+
+    def valid(self):
+        """Get a mask of records whose CRC matches."""
+        return crc_valid(self.records)
+
+    def slice_time(self, start=None, end=None):
+        """Get the records with start <= time < end, as a view.
+
+        Times only increase within a segment, as each boot starts a new one,
+        so this is a binary search of the index and then of the records in
+        the span it gives, touching O(log n + k) records.
+
+        :param start: First time to include, None for the beginning
+        :param end: Time to stop before, None for the end
+
+        """
+        if not len(self.index):
+            return self.records[:0]
+        lo, hi = span(self.index, start, end)
+        records = self.records[lo:hi]
+        times = records['time']
+        first = 0 if start is None else np.searchsorted(times, start, side='left')
+        last = len(times) if end is None else np.searchsorted(times, end, side='left')
+        return records[first:last]
+
+    def __repr__(self):
+        return 'Segment({!r}, number={}, records={})'.format(self.path, self.number, len(self))
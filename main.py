@@ -4,15 +4,41 @@ from machine import I2C, Pin
 import bme680
 import time
 from bme680IAQ import IAQTracker
+from timeseries import TimeSeries
+from datalog import FlashLog
+from scheduler import Scheduler
+import instrument
 import gc
 
-CALIBRATION_CYCLES = 300  # Number of cycles needed for IAQ calibration
+CALIBRATION_CYCLES = 300  # Nominal IAQ calibration cycles; ends sooner once gas readings settle, or runs up to 3x longer
 CALIBRATION_INTERVAL = 1  # Time between calibration readings (1 second)
-NORMAL_READ_INTERVAL = 60  # 120 seconds for normal operation
+SAMPLE_INTERVAL = 10  # Time between sensor readings once calibrated (seconds)
+NORMAL_READ_INTERVAL = 60  # Time between display updates (seconds)
+SAVE_INTERVAL = 3600  # Minimum time between IAQ baseline snapshots, and between forced log flushes (seconds)
+IAQ_BASELINE_FILE = "iaq_baseline.json"  # IAQ calibration snapshot, restored at boot to skip calibration while the clock shows it recent
+LOG_DIR = "log"  # Reading log segments; a 4 KB page holds about 20 minutes of readings
+USE_LIGHTSLEEP = False  # lightsleep between tasks saves power but drops the USB serial console
+INSTRUMENT = False  # Time the hot paths into histograms, printed hourly and on a KEY0 press; off costs nothing
+
+# Scheduled tasks: name, period (ms), offset of the first run (ms). Sample runs every
+# CALIBRATION_INTERVAL until calibration completes. It only triggers a measurement;
+# read, one-shot (no period), collects the result once the conversion has finished
+TASKS = (
+    ("sample", SAMPLE_INTERVAL * 1000, 0),
+    ("read", None, 0),
+    ("render", NORMAL_READ_INTERVAL * 1000, 1000),
+    ("flush", SAVE_INTERVAL * 1000, SAVE_INTERVAL * 1000),
+    ("dump", SAVE_INTERVAL * 1000, SAVE_INTERVAL * 1000 + 1000),  # only with INSTRUMENT
+)
 
 # Initialize the e-paper display
 epaper = EpaperDisplay()
 
+# Reading history: the last 60 samples, then 1 min and 1 h min/max/mean, in a few KB.
+# Calibration readings come every CALIBRATION_INTERVAL, so only one per SAMPLE_INTERVAL
+# is recorded then, keeping the raw tier at the 10 minutes its period promises
+history = TimeSeries(tiers=((SAMPLE_INTERVAL, 60), (60, 60), (3600, 24)))
+
 def interpret_air_quality(aq_percent):
     if aq_percent >= 90:
         return "Very Good"
@@ -31,7 +57,9 @@ def main():
     sensor = bme680.BME680(i2c_addr=0x77, i2c_device=i2c)
 
     # Initialize IAQ tracker
-    iaq_tracker = IAQTracker()
+    iaq_tracker = IAQTracker(burn_in_cycles=CALIBRATION_CYCLES, adaptive_burn_in=True,
+                             gas_recal_period=3600 // SAMPLE_INTERVAL, save_interval=SAVE_INTERVAL,
+                             baseline_file=IAQ_BASELINE_FILE, sensor_id=sensor.signature)
 
     # Sensor setup
     sensor.set_humidity_oversample(bme680.OS_2X)
@@ -43,53 +71,92 @@ def main():
     sensor.set_gas_heater_duration(150)
     sensor.select_gas_heater_profile(0)
 
-    start_time = time.time()
-    remaining_calibration_cycles = CALIBRATION_CYCLES
-    last_reading_time = 0
-
-    print("Starting calibration phase...")
-
-    while True:
-        try:
-            current_time = time.time()
-
-            if sensor.get_sensor_data() and sensor.data.heat_stable:
-                temperature = sensor.data.temperature
-                pressure = sensor.data.pressure
-                humidity = sensor.data.humidity
-                gas = sensor.data.gas_resistance
+    if iaq_tracker.loadBaseline():
+        print("Restored IAQ baseline, skipping calibration.")
+    else:
+        print("Starting calibration phase...")
 
-                AQ = iaq_tracker.getIAQ(sensor.data)
+    flash_log = FlashLog(LOG_DIR)
 
-                if remaining_calibration_cycles > 0:
-                    print(f'Calibrating - Temp: {temperature:.2f} C, Pressure: {pressure:.2f} hPa, Humidity: {humidity:.2f} %RH, Gas: {gas} Ohms, Air Quality: {AQ if AQ is not None else "Calibrating"} (Cycles left: {remaining_calibration_cycles})')
-                    remaining_calibration_cycles -= 1
-                    time.sleep(CALIBRATION_INTERVAL)
-                    if remaining_calibration_cycles == 0:
-                        print("Calibration complete. Entering normal operation mode.")
-                elif current_time - last_reading_time >= NORMAL_READ_INTERVAL:
-                    if AQ is not None:
-                        quality = interpret_air_quality(AQ)
-                        print(f'Temp: {temperature:.2f} C, Pressure: {pressure:.2f} hPa, Humidity: {humidity:.2f} %RH, Gas: {gas} Ohms, Air Quality: {AQ:.1f}% ({quality})')
+    try:
+        run(sensor, iaq_tracker, flash_log)
+    finally:
+        iaq_tracker.saveBaseline(force=True)
+        flash_log.close()
 
-                        # Update the display with sensor readings
-                        epaper.update_display(temperature,pressure,humidity,quality)
+def run(sensor, iaq_tracker, flash_log):
+    scheduler = Scheduler(use_lightsleep=USE_LIGHTSLEEP)
+    calibrating = iaq_tracker.burn_in_cycles > 0
+    latest = None  # (temperature, pressure, humidity, gas, AQ) of the last reading
+    shown = False
 
-                        last_reading_time = current_time  # Update the last reading time
+    def sample():
+        sensor.trigger()
+        scheduler.run_soon("read", sensor.get_profile_duration())
 
-            else:
+    def read():
+        nonlocal calibrating, latest
+        try:
+            if not (sensor.get_triggered_data() and sensor.data.heat_stable):
                 print("Waiting for stable readings...")
+                scheduler.run_soon("sample", CALIBRATION_INTERVAL * 1000)
+                return
+            current_time = time.time()
+            temperature = sensor.data.temperature
+            pressure = sensor.data.pressure
+            humidity = sensor.data.humidity
+            gas = sensor.data.gas_resistance
+
+            AQ = iaq_tracker.getIAQ(sensor.data)
+            iaq_tracker.saveBaseline()  # throttled to one flash write per save_interval
+            if AQ is not None or current_time - history.last >= SAMPLE_INTERVAL:
+                history.add(current_time, temperature, pressure, humidity, gas, AQ)
+            flash_log.append(current_time, temperature, pressure, humidity, gas, AQ)
+            latest = (temperature, pressure, humidity, gas, AQ)
+
+            if AQ is None:
+                print(f'Calibrating - Temp: {temperature:.2f} C, Pressure: {pressure:.2f} hPa, Humidity: {humidity:.2f} %RH, Gas: {gas} Ohms, Air Quality: Calibrating (Cycles left: at most {iaq_tracker.burn_in_cycles})')
+            elif calibrating:
+                calibrating = False
+                print(f"Calibration complete after {iaq_tracker.burn_in_samples} cycles ({iaq_tracker.burn_in_time:.0f} s). Entering normal operation mode.")
+                scheduler.set_period("sample", SAMPLE_INTERVAL * 1000)
+            if AQ is not None and not shown:
+                scheduler.run_soon("render")  # first reading goes straight to the display
 
         except Exception as e:
             error_message = f"PICO Down - General error for BME680: {str(e)}"
             print(error_message)
 
-        #print("Free memory:", gc.mem_free())
-        gc.collect()  # Force garbage collection after each iteration
-
-        # Sleep for a short time to prevent tight looping
-        if remaining_calibration_cycles <= 0:
-            time.sleep(1)
+    def render():
+        nonlocal shown
+        if latest is None or latest[4] is None:
+            return
+        shown = True
+        temperature, pressure, humidity, gas, AQ = latest
+        quality = interpret_air_quality(AQ)
+        print(f'Temp: {temperature:.2f} C, Pressure: {pressure:.2f} hPa, Humidity: {humidity:.2f} %RH, Gas: {gas} Ohms, Air Quality: {AQ:.1f}% ({quality})')
+
+        # Update the display with sensor readings
+        epaper.update_display(temperature,pressure,humidity,quality)
+        gc.collect()  # Rendering allocates strings; sensor reads no longer do
+
+    def flush():
+        flash_log.flush(force=True)  # bounds the readings lost on power loss to SAVE_INTERVAL
+
+    callbacks = {"sample": sample, "read": read, "render": render, "flush": flush, "dump": instrument.dump}
+    for name, period_ms, offset_ms in TASKS:
+        if name == "dump" and not INSTRUMENT:
+            continue
+        scheduler.add(name, period_ms, callbacks[name], offset_ms)
+
+    if INSTRUMENT:
+        instrument.enable()
+        # KEY0 asks for a dump at the scheduler's next wakeup
+        epaper.epd.config.key0.irq(lambda pin: scheduler.run_soon("dump"), trigger=Pin.IRQ_FALLING)
+    if calibrating:
+        scheduler.set_period("sample", CALIBRATION_INTERVAL * 1000)
+
+    scheduler.run()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,126 @@
+import utime
+try:
+    from machine import lightsleep
+except ImportError:
+    lightsleep = None
+
+# Sleep between checks when no task has a deadline, eg. only idle one-shot tasks;
+# run_soon from an interrupt is then picked up within this
+IDLE_SLEEP_MS = 1000
+
+class Task:
+    def __init__(self, name, period_ms, callback, offset_ms=0):
+        self.name = name
+        self.period_ms = period_ms
+        self.callback = callback
+        self.offset_ms = offset_ms
+        self.deadline = None
+        self.runs = 0
+        self.skipped = 0  # periods missed because the loop was busy
+        self.busy_ms = 0
+        self.errors = 0  # runs that raised
+
+class Scheduler:
+    # Runs tasks at fixed periods from monotonic ticks_ms deadlines and sleeps until the
+    # next one. A deadline advances by whole periods from the previous deadline, not from
+    # when the task ran, so periods do not drift with task run time; periods missed while
+    # busy are skipped rather than run back to back. A task with period_ms None is
+    # one-shot: it runs once per run_soon and otherwise waits. A task that raises is
+    # reported and keeps its schedule, so one failure does not stop the loop.
+    # use_lightsleep sleeps with machine.lightsleep where the port has it, which stops
+    # USB serial on the Pico
+    def __init__(self, use_lightsleep=False):
+        self.tasks = []
+        self.sleep = lightsleep if use_lightsleep and lightsleep is not None else utime.sleep_ms
+        self.slept_ms = 0
+        self.started = None
+
+    def add(self, name, period_ms, callback, offset_ms=0):
+        task = Task(name, period_ms, callback, offset_ms)
+        if self.started is not None and period_ms is not None:
+            task.deadline = utime.ticks_add(utime.ticks_ms(), offset_ms)
+        self.tasks.append(task)
+        return task
+
+    def task(self, name):
+        for task in self.tasks:
+            if task.name == name:
+                return task
+        raise KeyError(name)
+
+    def set_period(self, name, period_ms):
+        # Takes effect from the task's next deadline
+        self.task(name).period_ms = period_ms
+
+    def run_soon(self, name, delay_ms=0):
+        # Run the task after delay_ms instead of at its deadline; its period then counts
+        # from there
+        self.task(name).deadline = utime.ticks_add(utime.ticks_ms(), delay_ms)
+
+    def start(self):
+        now = utime.ticks_ms()
+        self.started = now
+        for task in self.tasks:
+            if task.period_ms is not None:
+                task.deadline = utime.ticks_add(now, task.offset_ms)
+
+    def run_pending(self):
+        # Run every task whose deadline has passed, in table order
+        for task in self.tasks:
+            now = utime.ticks_ms()
+            if task.deadline is None or utime.ticks_diff(task.deadline, now) > 0:
+                continue
+            deadline = task.deadline
+            try:
+                task.callback()
+            except Exception as e:
+                task.errors += 1
+                print("Task {} failed: {}".format(task.name, e))
+            done = utime.ticks_ms()
+            task.runs += 1
+            task.busy_ms += utime.ticks_diff(done, now)
+            if task.deadline != deadline:
+                continue  # the task rescheduled itself with run_soon
+            if task.period_ms is None:
+                task.deadline = None
+                continue
+            deadline = utime.ticks_add(deadline, task.period_ms)
+            while utime.ticks_diff(deadline, done) <= 0:
+                deadline = utime.ticks_add(deadline, task.period_ms)
+                task.skipped += 1
+            task.deadline = deadline
+
+    def next_delay_ms(self):
+        # Milliseconds until the earliest deadline, 0 if one has passed, None if no
+        # task has a deadline
+        now = utime.ticks_ms()
+        delay = None
+        for task in self.tasks:
+            if task.deadline is None:
+                continue
+            wait = utime.ticks_diff(task.deadline, now)
+            if delay is None or wait < delay:
+                delay = wait
+        if delay is None:
+            return None
+        return 0 if delay < 0 else delay
+
+    def run(self):
+        if self.started is None:
+            self.start()
+        while True:
+            self.run_pending()
+            delay = self.next_delay_ms()
+            if delay is None:
+                delay = IDLE_SLEEP_MS
+            if delay:
+                self.sleep(delay)
+                self.slept_ms += delay
+
+    def stats(self):
+        # {name: (runs, busy ms, skipped periods, errors)}, plus time asleep and awake since start
+        stats = dict((task.name, (task.runs, task.busy_ms, task.skipped, task.errors)) for task in self.tasks)
+        elapsed = utime.ticks_diff(utime.ticks_ms(), self.started) if self.started is not None else 0
+        stats['slept_ms'] = self.slept_ms
+        stats['awake_ms'] = elapsed - self.slept_ms
+        return stats
@@ -0,0 +1,223 @@
+from array import array
+
+# Channels recorded per sample, in add() argument order
+CHANNELS = ('temperature', 'pressure', 'humidity', 'gas', 'aq')
+
+# Statistics kept per channel in aggregate tiers
+MIN = 0
+MAX = 1
+MEAN = 2
+
+# (seconds per slot, slots): raw samples for a minute, minutes for an hour, hours for a day
+DEFAULT_TIERS = ((1, 60), (60, 60), (3600, 24))
+
+NAN = float('nan')
+
+class Tier:
+    # Fixed-size ring of slots, each a timestamp and stats values per channel.
+    # The raw tier keeps one value per channel, aggregate tiers min, max and mean
+    def __init__(self, period, capacity, channels, stats):
+        self.period = period
+        self.capacity = capacity
+        self.channels = channels
+        self.stats = stats
+        self.width = channels * stats
+        self.times = array('l', [0] * capacity)
+        self.values = array('f', [0.0] * (capacity * self.width))
+        self.start = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def slot(self):
+        # Claim the next slot, overwriting the oldest when full; returns its index
+        if self.count < self.capacity:
+            index = (self.start + self.count) % self.capacity
+            self.count += 1
+        else:
+            index = self.start
+            self.start = (self.start + 1) % self.capacity
+        return index
+
+    def index(self, i):
+        # Slot index of the i-th oldest entry
+        return (self.start + i) % self.capacity
+
+    def memory(self):
+        return len(self.times) * self.times.itemsize + len(self.values) * self.values.itemsize
+
+class Rollup:
+    # Running min, max and sum per channel for the bucket being filled in an aggregate tier;
+    # doubles so an hour of gas readings sums without losing the mean
+    def __init__(self, tier):
+        self.tier = tier
+        self.bucket = None
+        self.acc = array('d', [0.0] * (tier.channels * 3))
+        self.n = array('H', [0] * tier.channels)
+
+    def reset(self, bucket):
+        self.bucket = bucket
+        for c in range(self.tier.channels):
+            self.n[c] = 0
+
+    def add(self, values):
+        acc = self.acc
+        n = self.n
+        for c in range(len(values)):
+            v = values[c]
+            if v != v:  # NaN: channel not available for this sample
+                continue
+            k = c * 3
+            if n[c] == 0:
+                acc[k] = v
+                acc[k + 1] = v
+                acc[k + 2] = v
+            else:
+                if v < acc[k]:
+                    acc[k] = v
+                if v > acc[k + 1]:
+                    acc[k + 1] = v
+                acc[k + 2] += v
+            n[c] += 1
+
+    def stats(self, c):
+        # (min, max, mean, count) of channel c in the open bucket
+        n = self.n[c]
+        if n == 0:
+            return NAN, NAN, NAN, 0
+        k = c * 3
+        return self.acc[k], self.acc[k + 1], self.acc[k + 2] / n, n
+
+    def close(self):
+        # Write the bucket into the tier as one slot
+        tier = self.tier
+        index = tier.slot()
+        tier.times[index] = self.bucket * tier.period
+        base = index * tier.width
+        values = tier.values
+        for c in range(tier.channels):
+            mn, mx, mean, n = self.stats(c)
+            values[base + c * 3 + MIN] = mn
+            values[base + c * 3 + MAX] = mx
+            values[base + c * 3 + MEAN] = mean
+
+class TimeSeries:
+    # Multi-resolution history: every sample goes to the raw tier and is rolled up into
+    # each aggregate tier, all O(1) per sample and allocation-free, in fixed-size arrays
+    def __init__(self, tiers=DEFAULT_TIERS, channels=CHANNELS):
+        self.channels = channels
+        raw_period, raw_capacity = tiers[0]
+        self.tiers = [Tier(raw_period, raw_capacity, len(channels), 1)]
+        self.rollups = []
+        for period, capacity in tiers[1:]:
+            tier = Tier(period, capacity, len(channels), 3)
+            self.tiers.append(tier)
+            self.rollups.append(Rollup(tier))
+        self.sample = array('f', [0.0] * len(channels))
+        self.last = 0
+
+    def channel(self, name):
+        return self.channels.index(name)
+
+    def add(self, t, *values):
+        # t in whole seconds; a value of None (eg. AQ during burn-in) is stored as NaN
+        # and left out of aggregates
+        t = int(t)
+        self.last = t
+        sample = self.sample
+        for c in range(len(sample)):
+            v = values[c]
+            sample[c] = NAN if v is None else v
+
+        raw = self.tiers[0]
+        index = raw.slot()
+        raw.times[index] = t
+        base = index * raw.width
+        for c in range(len(sample)):
+            raw.values[base + c] = sample[c]
+
+        for rollup in self.rollups:
+            bucket = t // rollup.tier.period
+            if bucket != rollup.bucket:
+                if rollup.bucket is not None:
+                    rollup.close()
+                rollup.reset(bucket)
+            rollup.add(sample)
+
+    def tierFor(self, seconds):
+        # Finest tier whose ring spans the window, else the coarsest
+        for i, tier in enumerate(self.tiers):
+            if tier.period * tier.capacity >= seconds:
+                return i
+        return len(self.tiers) - 1
+
+    def window(self, name, seconds, now=None):
+        # (min, max, mean, count) of a channel over the last seconds, from the finest
+        # tier covering it; count is samples for the raw tier, slots otherwise. Aggregate
+        # tiers include the bucket still being filled and average slot means, so the window
+        # snaps to slot edges. NaN stats when there is no data
+        c = self.channel(name)
+        i = self.tierFor(seconds)
+        tier = self.tiers[i]
+        if now is None:
+            now = self.last
+        since = now - seconds
+
+        stat_min = None
+        stat_max = None
+        total = 0.0
+        n = 0
+        if i == 0:
+            # Raw values: min, max and mean all read the one value
+            offset, o_min, o_max, o_mean, span = c, 0, 0, 0, 0
+        else:
+            offset, o_min, o_max, o_mean, span = c * 3, MIN, MAX, MEAN, tier.period
+            rollup = self.rollups[i - 1]
+            mn, mx, mean, count = rollup.stats(c)
+            if count and (rollup.bucket + 1) * tier.period > since:
+                stat_min, stat_max, total, n = mn, mx, mean, 1
+
+        values = tier.values
+        for j in range(tier.count - 1, -1, -1):
+            index = tier.index(j)
+            # Slots ending at or before the window start are out, and so is all before them
+            if tier.times[index] + span <= since:
+                break
+            base = index * tier.width + offset
+            mean = values[base + o_mean]
+            if mean != mean:
+                continue
+            mn = values[base + o_min]
+            mx = values[base + o_max]
+            if stat_min is None or mn < stat_min:
+                stat_min = mn
+            if stat_max is None or mx > stat_max:
+                stat_max = mx
+            total += mean
+            n += 1
+
+        if n == 0:
+            return NAN, NAN, NAN, 0
+        return stat_min, stat_max, total / n, n
+
+    def series(self, name, tier=0, stat=MEAN):
+        # [(t, value), ...] oldest first for one tier; stat picks MIN, MAX or MEAN in
+        # aggregate tiers
+        c = self.channel(name)
+        ring = self.tiers[tier]
+        offset = c if tier == 0 else c * 3 + stat
+        out = []
+        for j in range(ring.count):
+            index = ring.index(j)
+            out.append((ring.times[index], ring.values[index * ring.width + offset]))
+        return out
+
+    def memory(self):
+        # Bytes held in arrays, fixed at construction
+        total = len(self.sample) * self.sample.itemsize
+        for tier in self.tiers:
+            total += tier.memory()
+        for rollup in self.rollups:
+            total += len(rollup.acc) * rollup.acc.itemsize + len(rollup.n) * rollup.n.itemsize
+        return total